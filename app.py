@@ -1,14 +1,16 @@
 
-import numpy as np
 import pandas as pd
 import streamlit as st
-from matplotlib import pyplot as plt
-from preprocess import preprocess
+from preprocess import preprocess, starts_message
+from cache import HEAD_BYTES, BytesLRUCache, Fingerprint, LRUCache, content_hash
+from chat_index import ChatIndex
+from features import extract_features
+from timing import METRICS, StageTimer, progress_range
+import json
 import helper
+import charts
 import plotly.express as px
-import seaborn as sns
 from datetime import datetime
-import io
 import base64
 import os
 
@@ -20,6 +22,10 @@ if 'analyzed' not in st.session_state:
     st.session_state.analyzed = False
 if 'current_file' not in st.session_state:
     st.session_state.current_file = None
+if 'chat_hash' not in st.session_state:
+    st.session_state.chat_hash = None
+if 'load_timings' not in st.session_state:
+    st.session_state.load_timings = {}
 
 # Custom CSS for animations and styling
 st.markdown("""
@@ -164,7 +170,6 @@ st.markdown("""
     }
 </style>
 """, unsafe_allow_html=True)
-plt.style.use('dark_background')
 
 # Sidebar with custom title color
 st.sidebar.markdown("""
@@ -181,6 +186,115 @@ st.sidebar.markdown("""
 
 DEMO_DATASET_PATH = "WhatsApp Chat with BCA friend zone .txt"
 
+# Parsed chats kept in memory (per server process, shared by all sessions)
+CHAT_CACHE_SIZE = 8
+
+# Optional on-disk cache shared across restarts/replicas, e.g. WP_CHAT_CACHE_DIR=/var/cache/wp_chat
+CHAT_CACHE_DIR = os.environ.get("WP_CHAT_CACHE_DIR")
+
+
+# Rendered chart PNGs (per server process, shared by all sessions), bounded by total size
+CHART_CACHE_BYTES = 64 * 1024 * 1024
+
+
+@st.cache_resource
+def get_chat_cache():
+    return LRUCache(maxsize=CHAT_CACHE_SIZE)
+
+
+@st.cache_resource
+def get_chart_cache():
+    return BytesLRUCache(maxbytes=CHART_CACHE_BYTES)
+
+
+
+def timings_table(timings):
+    """Stage timings (seconds per stage) as a small table for the performance panel."""
+    table = pd.DataFrame({'stage': list(timings), 'seconds': list(timings.values())})
+    table['share'] = (table['seconds'] / max(table['seconds'].sum(), 1e-9) * 100).round(1).astype(str) + '%'
+    table['seconds'] = table['seconds'].round(3)
+    return table
+
+
+def metrics_table(snapshot):
+    """Per-function metrics (timing.METRICS.snapshot()) as a table for the debug panel."""
+    table = pd.DataFrame.from_dict(snapshot, orient='index')
+    table.index.name = 'function'
+    return table.reset_index()
+
+
+# Share of the load progress bar each step covers: (start, end)
+PARSE_PROGRESS = (0.05, 0.70)
+FEATURES_PROGRESS = (0.70, 0.90)
+
+
+def read_source(source):
+    """Raw bytes of an uploaded file or a path on disk."""
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            return f.read()
+    return source.getvalue()
+
+
+def extend_cached_chat(chats, raw, progress=None):
+    """
+    If `raw` is a re-export of a cached chat (the old file plus new messages),
+    parse only the new tail and return the cached chat extended with it; otherwise None.
+    """
+    for _, chat in reversed(chats.items()):
+        base = chat.source
+        if base is None or chat.formats is None or not base.is_prefix_of(raw):
+            continue
+        if not starts_message(raw, base.size):
+            # the old export ended mid-message, so its last row would change
+            continue
+        tail = preprocess(raw[base.size:], compact=True, formats=chat.formats,
+                          progress=progress_range(progress, *PARSE_PROGRESS))
+        if not tail.empty:
+            tail = extract_features(tail, progress=progress_range(progress, *FEATURES_PROGRESS))
+        if progress is not None:
+            progress("Merging into cached chat", FEATURES_PROGRESS[1])
+        return chat.extend(tail)
+    return None
+
+
+def load_chat(source, chat_hash, spinner_text):
+    """
+    Return the indexed chat for `chat_hash`, running preprocess() only on a cache miss.
+    A grown re-export of a cached chat only has its new messages parsed and merged in.
+    Raises ValueError if the file holds no WhatsApp messages.
+    """
+    chats = get_chat_cache()
+    chat = chats.get(chat_hash)
+    if chat is None:
+        # real stage progress: preprocess()/extract_features() report into the timer, each
+        # mapped onto its share of one bar that only moves forward
+        progress_bar = st.progress(0.0, text=spinner_text)
+        timer = StageTimer(lambda stage, fraction: progress_bar.progress(fraction, text=f"{spinner_text} {stage}"))
+
+        timer("Reading file", 0.0)
+        raw = read_source(source)
+        chat = extend_cached_chat(chats, raw, progress=timer)
+        if chat is None:
+            df = preprocess(raw, compact=True, cache_dir=CHAT_CACHE_DIR,
+                            progress=progress_range(timer, *PARSE_PROGRESS))
+            if df.empty:
+                progress_bar.empty()
+                raise ValueError("no WhatsApp messages found in this file")
+            df = extract_features(df, progress=progress_range(timer, *FEATURES_PROGRESS))
+            timer("Indexing users", FEATURES_PROGRESS[1])
+            chat = ChatIndex(df)
+        timer("Building aggregates", 0.95)
+        chat.rollup()
+        chat.activity('over all')
+        chat.source = Fingerprint(len(raw), content_hash(raw[:HEAD_BYTES]), chat_hash)
+
+        st.session_state.load_timings[chat_hash] = timer.finish()
+        progress_bar.empty()
+        chats.put(chat_hash, chat)
+    return chat
+
+
 # File upload section with demo option
 st.sidebar.markdown("### 📂 Data Source")
 data_source = st.sidebar.radio(
@@ -190,35 +304,42 @@ data_source = st.sidebar.radio(
 )
 
 df = None
+chat = None
 
 if data_source == "Upload File":
     uploaded_file = st.sidebar.file_uploader("📁 Choose a WhatsApp .txt file", type=["txt"])
 
     if uploaded_file is not None:
-        # Check if it's a new file
-        file_id = uploaded_file.name + str(uploaded_file.size)
+        # Check if it's a new file (hash the bytes once per upload, not on every rerun)
+        file_id = uploaded_file.file_id
         if st.session_state.current_file != file_id:
             st.session_state.analyzed = False
             st.session_state.current_file = file_id
+            st.session_state.chat_hash = content_hash(uploaded_file.getvalue())
 
-        with st.spinner('🔄 Processing your chat...'):
-            data = uploaded_file.read().decode("utf-8", errors="ignore")
-            df = preprocess(data)
-        st.sidebar.success("✅ File loaded successfully!")
+        try:
+            chat = load_chat(uploaded_file, st.session_state.chat_hash, '🔄 Processing your chat...')
+            df = chat.df
+            st.sidebar.success("✅ File loaded successfully!")
+        except ValueError as e:
+            st.sidebar.error(f"❌ Couldn't read this chat: {e}")
+            st.sidebar.info("📌 Export it from WhatsApp with \"Export chat\" (without media) and upload the .txt file.")
 
 elif data_source == "Use Demo Dataset":
     # Check if switching to demo dataset
     if st.session_state.current_file != "demo_dataset":
         st.session_state.analyzed = False
         st.session_state.current_file = "demo_dataset"
+        st.session_state.chat_hash = None
 
     # Load demo dataset
     if os.path.exists(DEMO_DATASET_PATH):
         try:
-            with st.spinner('🔄 Loading demo dataset...'):
-                with open(DEMO_DATASET_PATH, 'r', encoding='utf-8', errors='ignore') as f:
-                    data = f.read()
-                df = preprocess(data)
+            if st.session_state.chat_hash is None:
+                with open(DEMO_DATASET_PATH, 'rb') as f:
+                    st.session_state.chat_hash = content_hash(f.read())
+            chat = load_chat(DEMO_DATASET_PATH, st.session_state.chat_hash, '🔄 Loading demo dataset...')
+            df = chat.df
             st.sidebar.success("✅ Demo dataset loaded successfully!")
             st.sidebar.info("💡 This is a sample dataset for demonstration purposes.")
         except Exception as e:
@@ -230,7 +351,7 @@ elif data_source == "Use Demo Dataset":
         st.sidebar.info("📌 Look for 'DEMO_DATASET_PATH' variable in the code to set the correct path.")
 
 if df is not None:
-    user_list = df['user'].unique().tolist()
+    user_list = list(chat.users)
 
     # Remove unwanted users
     for u in ['group_notification', 'Meta AI']:
@@ -244,6 +365,24 @@ if df is not None:
     st.sidebar.markdown("---")
     selected_user = st.sidebar.selectbox("👤 Show analysis for:", user_list, key="user_select")
 
+    # Date Range (an O(log N) slice of the time-sorted chat, cached per range)
+    st.sidebar.markdown("---")
+    first_ts, last_ts = chat.span
+    start_date, end_date = first_ts.date(), last_ts.date()
+    date_range = st.sidebar.date_input(
+        "📅 Date range:",
+        value=(start_date, end_date),
+        min_value=start_date,
+        max_value=end_date,
+        key=f"date_range_{st.session_state.chat_hash}"
+    )
+    if isinstance(date_range, (tuple, list)) and len(date_range) == 2:
+        start_date, end_date = date_range
+    if (start_date, end_date) == (first_ts.date(), last_ts.date()):
+        chat_view = chat
+    else:
+        chat_view = chat.between(start_date, end_date)
+
     # Comparison Mode
     st.sidebar.markdown("---")
     compare_mode = st.sidebar.checkbox("🔄 Compare Users", key="compare_check")
@@ -254,6 +393,13 @@ if df is not None:
         if compare_users:
             compare_user = st.sidebar.selectbox("Compare with:", compare_users, key="compare_select")
 
+    # Link detection mode
+    strict_links = st.sidebar.checkbox("🔗 Strict link detection (slower)", key="strict_links_check")
+
+    # Per-stage wall-clock timings of the load and of this rerun
+    show_performance = st.sidebar.checkbox("⏱️ Show performance panel", key="performance_check")
+    run_timer = StageTimer()
+
     # Analyze button - prominently placed
     st.sidebar.markdown("---")
     st.sidebar.markdown("### 🚀 Ready to Analyze?")
@@ -266,26 +412,27 @@ if df is not None:
 
     if st.session_state.analyzed:
 
-        # Function to download figure without rerun
-        def get_image_download_link(fig, filename):
-            buf = io.BytesIO()
-            fig.savefig(buf, format='png', bbox_inches='tight', dpi=150, facecolor='#0e1117')
-            buf.seek(0)
-            return buf.getvalue()
-
-
-        # Progress bar
-        progress_bar = st.progress(0)
-        for i in range(100):
-            progress_bar.progress(i + 1)
-        progress_bar.empty()
+        # Each chart is rendered once per (chat, date range, chart, users); the PNG bytes
+        # feed both the inline image and its download button
+        def chart_png(name, build, *users):
+            key = (st.session_state.chat_hash, start_date, end_date, name) + users
+            cache = get_chart_cache()
+            png = cache.get(key)
+            if png is None:
+                fig = build()
+                png = charts.figure_png(fig)
+                # Figure <-> Axes are reference cycles: drop the artists now, not at the next GC pass
+                fig.clear()
+                cache.put(key, png)
+            return png
 
         # Get stats
-        num_message, words, media, links = helper.fetch_stats(selected_user, df)
+        run_timer("Top statistics")
+        num_message, words, media, links = helper.fetch_stats(selected_user, chat_view, strict_links)
 
         # Comparison stats
         if compare_mode and compare_user:
-            num_message2, words2, media2, links2 = helper.fetch_stats(compare_user, df)
+            num_message2, words2, media2, links2 = helper.fetch_stats(compare_user, chat_view, strict_links)
 
         # Title with animation
         st.markdown('<h1 class="custom-title">📊 Chat Analysis Dashboard</h1>', unsafe_allow_html=True)
@@ -325,6 +472,7 @@ if df is not None:
         summary_text = f"""WhatsApp Chat Analysis Summary
 {'=' * 60}
 User: {selected_user}
+Period: {start_date} to {end_date}
 
 📊 STATISTICS
 {'─' * 60}
@@ -343,160 +491,131 @@ Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
             key="summary_download"
         )
 
-        # Monthly Timeline
+        # Sections render one at a time: only the visible one computes (and each helper
+        # result is memoized on the chat / date-range view, so revisiting a section is cheap)
         st.markdown("---")
-        st.subheader("📅 Monthly Timeline")
-        timeline = helper.monthly_timeline(df, selected_user)
+        sections = ["📅 Timelines", "⚡ Activity", "💬 Words", "🔗 Links", "😊 Emojis", "❓ Questions"]
+        if selected_user == "over all":
+            sections.insert(2, "👥 Busy Users")
+        section = st.radio("Section", sections, horizontal=True, key="section_select",
+                           label_visibility="collapsed")
+        run_timer(f"Section: {section}")
 
-        fig, ax = plt.subplots(figsize=(14, 6))
-        ax.plot(timeline['date'], timeline['message'], marker='o', linewidth=2.5,
-                markersize=8, label=selected_user, color='#667eea')
+        if section == "📅 Timelines":
+            # Monthly Timeline
+            st.markdown("---")
+            st.subheader("📅 Monthly Timeline")
 
-        if compare_mode and compare_user:
-            timeline2 = helper.monthly_timeline(df, compare_user)
-            ax.plot(timeline2['date'], timeline2['message'], marker='s', linewidth=2.5,
-                    markersize=8, label=compare_user, color='#764ba2')
-            ax.legend(fontsize=12, frameon=True, shadow=True)
-
-        ax.grid(True, alpha=0.3, linestyle='--')
-        plt.xticks(rotation=45, ha='right')
-        plt.xlabel("Date", fontsize=12, fontweight='bold')
-        plt.ylabel("No of Messages", fontsize=12, fontweight='bold')
-        plt.tight_layout()
-        st.pyplot(fig)
+            def build_monthly_timeline():
+                lines = [(selected_user, helper.monthly_timeline(chat_view, selected_user))]
+                if compare_mode and compare_user:
+                    lines.append((compare_user, helper.monthly_timeline(chat_view, compare_user)))
+                return charts.timeline_chart(lines, linewidth=2.5, markersize=8)
 
-        st.download_button(
-            "💾 Download Chart",
-            get_image_download_link(fig, "monthly_timeline.png"),
-            f"monthly_timeline_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png",
-            "image/png",
-            key="monthly_download"
-        )
+            png = chart_png("monthly_timeline", build_monthly_timeline, selected_user, compare_user)
+            st.image(png, use_container_width=True)
 
-        # Daily Timeline
-        st.markdown("---")
-        st.subheader("📆 Daily Timeline")
-        daily_timeline = helper.daily_timeline(df, selected_user)
+            st.download_button(
+                "💾 Download Chart",
+                png,
+                f"monthly_timeline_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png",
+                "image/png",
+                key="monthly_download"
+            )
 
-        fig, ax = plt.subplots(figsize=(14, 6))
-        ax.plot(daily_timeline['date'], daily_timeline['message'],
-                color='#667eea', marker='o', linewidth=2, markersize=6, label=selected_user)
+            # Daily Timeline
+            st.markdown("---")
+            st.subheader("📆 Daily Timeline")
 
-        if compare_mode and compare_user:
-            daily_timeline2 = helper.daily_timeline(df, compare_user)
-            ax.plot(daily_timeline2['date'], daily_timeline2['message'],
-                    color='#764ba2', marker='s', linewidth=2, markersize=6, label=compare_user)
-            ax.legend(fontsize=12, frameon=True, shadow=True)
-
-        ax.grid(True, alpha=0.3, linestyle='--')
-        plt.xticks(rotation=45, ha='right')
-        plt.xlabel("Date", fontsize=12, fontweight='bold')
-        plt.ylabel("No of Messages", fontsize=12, fontweight='bold')
-        plt.tight_layout()
-        st.pyplot(fig)
+            def build_daily_timeline():
+                lines = [(selected_user, helper.daily_timeline(chat_view, selected_user))]
+                if compare_mode and compare_user:
+                    lines.append((compare_user, helper.daily_timeline(chat_view, compare_user)))
+                return charts.timeline_chart(lines, linewidth=2, markersize=6)
 
-        st.download_button(
-            "💾 Download Chart",
-            get_image_download_link(fig, "daily_timeline.png"),
-            f"daily_timeline_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png",
-            "image/png",
-            key="daily_download"
-        )
-
-        # Activity Map
-        st.markdown("---")
-        st.subheader("⚡ Activity Map")
-        col1, col2 = st.columns(2)
-
-        with col1:
-            st.markdown("### 📊 Most Active Day")
-            busy_day = helper.week_activity_map(df, selected_user)
-            colors = ['#667eea', '#764ba2', '#f093fb', '#4facfe', '#43e97b', '#fa709a', '#fee140']
-
-            fig, ax = plt.subplots(figsize=(8, 6))
-            bars = ax.bar(busy_day.index, busy_day.values, color=colors[:len(busy_day)])
-            ax.set_xlabel("Day Name", fontsize=12, fontweight='bold')
-            ax.set_ylabel("Number of Messages", fontsize=12, fontweight='bold')
-            ax.grid(axis='y', alpha=0.3, linestyle='--')
-            plt.xticks(rotation=45, ha='right')
-            plt.tight_layout()
-            st.pyplot(fig)
+            png = chart_png("daily_timeline", build_daily_timeline, selected_user, compare_user)
+            st.image(png, use_container_width=True)
 
             st.download_button(
-                "💾 Download",
-                get_image_download_link(fig, "active_day.png"),
-                f"active_day_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png",
+                "💾 Download Chart",
+                png,
+                f"daily_timeline_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png",
                 "image/png",
-                key="day_download"
+                key="daily_download"
             )
 
-        with col2:
-            st.markdown("### 📅 Most Active Month")
-            busy_month = helper.month_activity_map(df, selected_user)
-            colors = ['#fa709a', '#fee140', '#30cfd0', '#667eea', '#f093fb', '#4facfe']
+        elif section == "⚡ Activity":
+            # Activity Map
+            st.markdown("---")
+            st.subheader("⚡ Activity Map")
+            col1, col2 = st.columns(2)
 
-            fig, ax = plt.subplots(figsize=(8, 6))
-            bars = ax.bar(busy_month.index, busy_month.values, color=colors[:len(busy_month)])
-            ax.set_xticklabels(busy_month.index, rotation=45, ha='right')
-            ax.set_xlabel("Month Name", fontsize=12, fontweight='bold')
-            ax.set_ylabel("Number of Messages", fontsize=12, fontweight='bold')
-            ax.grid(axis='y', alpha=0.3, linestyle='--')
-            plt.tight_layout()
-            st.pyplot(fig)
+            with col1:
+                st.markdown("### 📊 Most Active Day")
 
-            st.download_button(
-                "💾 Download",
-                get_image_download_link(fig, "active_month.png"),
-                f"active_month_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png",
-                "image/png",
-                key="month_download"
-            )
+                png = chart_png("active_day", lambda: charts.activity_bar_chart(
+                    helper.week_activity_map(chat_view, selected_user), charts.DAY_COLORS, "Day Name"
+                ), selected_user)
+                st.image(png, use_container_width=True)
 
-        # Heatmap
-        st.markdown("---")
-        st.subheader("🔥 Most Active User Time Period")
-        period_df = helper.show_heatmap(df, selected_user)
-        pivot_df = period_df.pivot_table(
-            index='day_name',
-            columns='period',
-            values='user_message',
-            aggfunc='count'
-        ).fillna(0)
-        pivot_df = pivot_df.reindex(sorted(pivot_df.columns, key=lambda x: int(x.split("-")[0])), axis=1)
-
-        fig = plt.figure(figsize=(20, 7))
-
-        sns.heatmap(pivot_df, annot=True, fmt='.0f', cmap='RdYlGn', linewidths=0.5,
-                    cbar_kws={'label': 'Message Count'})
-        plt.xticks(rotation=45, ha='right')
-        plt.yticks(rotation=0)
-        plt.xlabel("Time Period", fontsize=12, fontweight='bold')
-        plt.ylabel("Day Name", fontsize=12, fontweight='bold')
-        plt.title("Heatmap of Messages by Day and Period", fontsize=14, fontweight='bold', pad=20)
-        plt.tight_layout()
-        st.pyplot(fig)
+                st.download_button(
+                    "💾 Download",
+                    png,
+                    f"active_day_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png",
+                    "image/png",
+                    key="day_download"
+                )
 
-        st.download_button(
-            "💾 Download Heatmap",
-            get_image_download_link(fig, "heatmap.png"),
-            f"heatmap_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png",
-            "image/png",
-            key="heatmap_download"
-        )
+            with col2:
+                st.markdown("### 📅 Most Active Month")
 
-        # Most busy person
-        if selected_user == "over all":
+                png = chart_png("active_month", lambda: charts.activity_bar_chart(
+                    helper.month_activity_map(chat_view, selected_user), charts.MONTH_COLORS, "Month Name"
+                ), selected_user)
+                st.image(png, use_container_width=True)
+
+                st.download_button(
+                    "💾 Download",
+                    png,
+                    f"active_month_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png",
+                    "image/png",
+                    key="month_download"
+                )
+
+            # Heatmap
+            st.markdown("---")
+            st.subheader("🔥 Most Active User Time Period")
+
+            pivot = helper.show_heatmap(chat_view, selected_user)
+            if pivot.empty:
+                # no messages from this selection in the date range: nothing to draw
+                st.info("No messages in this period.")
+            else:
+                png = chart_png("heatmap", lambda: charts.heatmap_chart(pivot), selected_user)
+                st.image(png, use_container_width=True)
+
+                st.download_button(
+                    "💾 Download Heatmap",
+                    png,
+                    f"heatmap_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png",
+                    "image/png",
+                    key="heatmap_download"
+                )
+
+        elif section == "👥 Busy Users":
+            # Most busy person
             st.markdown("---")
             st.subheader("👥 Most Busy Users")
-            fig, x, new_df = helper.show_top_user(df)
+            x, new_df = helper.top_users(chat_view)
+            png = chart_png("busy_users", lambda: charts.top_users_chart(x))
 
             col1, col2 = st.columns(2)
             with col1:
                 st.markdown("### 📊 Top 5 Active Users")
-                st.pyplot(fig)
+                st.image(png, use_container_width=True)
                 st.download_button(
                     "💾 Download",
-                    get_image_download_link(fig, "busy_users.png"),
+                    png,
                     f"busy_users_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png",
                     "image/png",
                     key="users_download"
@@ -505,157 +624,159 @@ Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
                 st.markdown("### 📈 Message Distribution")
                 st.dataframe(new_df, use_container_width=True)
 
-        # WordCloud and Common Words
-        st.markdown("---")
-        st.subheader("💬 Word Analysis")
-        st_words = helper.most_common_words(df, selected_user)
+        elif section == "💬 Words":
+            # WordCloud and Common Words
+            st.markdown("---")
+            st.subheader("💬 Word Analysis")
+            st_words = helper.most_common_words(chat_view, selected_user)
 
-        # Check if there are any words to analyze
-        if st_words.empty or len(st_words) == 0:
-            st.warning(
-                f"⚠️ No text messages found for {selected_user}. This user may have only sent media or has no messages.")
-        else:
-            col1, col2 = st.columns(2)
+            # Check if there are any words to analyze
+            if st_words.empty or len(st_words) == 0:
+                st.warning(
+                    f"⚠️ No text messages found for {selected_user}. This user may have only sent media or has no messages.")
+            else:
+                col1, col2 = st.columns(2)
+
+                with col1:
+                    st.markdown("### ☁️ WordCloud")
+                    try:
+                        png = chart_png("wordcloud", lambda: charts.wordcloud_chart(
+                            helper.wc_stats(selected_user, chat_view)
+                        ), selected_user)
+                        st.image(png, use_container_width=True)
+
+                        st.download_button(
+                            "💾 Download",
+                            png,
+                            f"wordcloud_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png",
+                            "image/png",
+                            key="wc_download"
+                        )
+                    except ValueError:
+                        st.warning("⚠️ Not enough words to generate a word cloud for this user.")
+
+                with col2:
+                    st.markdown("### 📝 Top 20 Words")
+                    st.dataframe(st_words, use_container_width=True, height=400)
+
+                # Common Words Bar Chart
+                st.markdown("---")
+                st.subheader("📊 Most Common Words Chart")
+
+                png = chart_png("common_words", lambda: charts.common_words_chart(st_words), selected_user)
+                st.image(png, use_container_width=True)
 
-            with col1:
-                st.markdown("### ☁️ WordCloud")
-                try:
-                    wc_img = helper.wc_stats(selected_user, df)
-                    fig, ax = plt.subplots(figsize=(10, 8))
-                    ax.imshow(wc_img, interpolation='bilinear')
-                    ax.axis('off')
-                    plt.tight_layout()
-                    st.pyplot(fig)
-
-                    st.download_button(
-                        "💾 Download",
-                        get_image_download_link(fig, "wordcloud.png"),
-                        f"wordcloud_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png",
-                        "image/png",
-                        key="wc_download"
-                    )
-                except ValueError:
-                    st.warning("⚠️ Not enough words to generate a word cloud for this user.")
+                st.download_button(
+                    "💾 Download Chart",
+                    png,
+                    f"common_words_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png",
+                    "image/png",
+                    key="words_download"
+                )
 
-            with col2:
-                st.markdown("### 📝 Top 20 Words")
-                st.dataframe(st_words, use_container_width=True, height=400)
+        elif section == "🔗 Links":
+            # Links shared per domain
+            st.markdown("---")
+            st.subheader("🔗 Links by Domain")
+            if links:
+                st.dataframe(helper.link_domain_stats(selected_user, chat_view), use_container_width=True)
+            else:
+                st.info("No links shared in this period.")
 
-            # Common Words Bar Chart
+        elif section == "😊 Emojis":
+            # Emoji Analysis
             st.markdown("---")
-            st.subheader("📊 Most Common Words Chart")
-            n = len(st_words)
-            colors = plt.cm.viridis(np.linspace(0, 1, n))
-
-            fig, ax = plt.subplots(figsize=(12, 10))
-            bars = ax.barh(st_words['word'], st_words['count'], color=colors)
-            ax.invert_yaxis()
-            ax.set_xlabel("Frequency", fontsize=12, fontweight='bold')
-            ax.set_ylabel("Words", fontsize=12, fontweight='bold')
-            ax.grid(axis='x', alpha=0.3, linestyle='--')
-            plt.tight_layout()
-            st.pyplot(fig)
+            st.subheader("😊 Emoji Summary")
+            emojis, new_df = helper.emojies(selected_user, chat_view)
 
-            st.download_button(
-                "💾 Download Chart",
-                get_image_download_link(fig, "common_words.png"),
-                f"common_words_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png",
-                "image/png",
-                key="words_download"
-            )
+            if emojis is None:
+                st.warning("⚠️ No emojis used by this user!")
+            else:
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.markdown("### 📋 All Emojis Used")
+                    st.dataframe(emojis, use_container_width=True, height=400)
+                with col2:
+                    st.markdown("### 🏆 Top 10 Emoji Usage")
+                    fig = px.pie(
+                        new_df,
+                        values='count',
+                        names='emoji',
+                        title="Top 10 Used Emojis",
+                        hole=0.4,
+                        color_discrete_sequence=px.colors.qualitative.Set3
+                    )
+                    fig.update_traces(textposition='inside', textinfo='percent+label', textfont_size=14)
+                    fig.update_layout(showlegend=True, height=500)
+                    st.plotly_chart(fig, use_container_width=True)
 
-        # Emoji Analysis
-        st.markdown("---")
-        st.subheader("😊 Emoji Summary")
-        emojis, new_df = helper.emojies(selected_user, df)
+        elif section == "❓ Questions":
+            # Question vs Statement Analysis
+            st.markdown("---")
+            st.subheader("❓ Question vs Statement Analysis")
+
+            questions, statements, q_percent, s_percent = helper.question_vs_statement(chat_view, selected_user)
 
-        if emojis is None:
-            st.warning("⚠️ No emojis used by this user!")
-        else:
             col1, col2 = st.columns(2)
+
             with col1:
-                st.markdown("### 📋 All Emojis Used")
-                st.dataframe(emojis, use_container_width=True, height=400)
-            with col2:
-                st.markdown("### 🏆 Top 10 Emoji Usage")
+                st.markdown("### 📊 Overall Ratio")
+
+                # Create metrics
+                metric_col1, metric_col2 = st.columns(2)
+                with metric_col1:
+                    st.metric("❓ Questions", questions, f"{q_percent}%")
+                with metric_col2:
+                    st.metric("💬 Statements", statements, f"{s_percent}%")
+
+                # Pie chart for selected user
                 fig = px.pie(
-                    new_df,
-                    values='count',
-                    names='emoji',
-                    title="Top 10 Used Emojis",
+                    values=[questions, statements],
+                    names=['Questions', 'Statements'],
+                    title=f"{selected_user}'s Communication Style",
                     hole=0.4,
-                    color_discrete_sequence=px.colors.qualitative.Set3
+                    color_discrete_sequence=['#667eea', '#764ba2']
                 )
                 fig.update_traces(textposition='inside', textinfo='percent+label', textfont_size=14)
-                fig.update_layout(showlegend=True, height=500)
+                fig.update_layout(showlegend=True, height=400)
                 st.plotly_chart(fig, use_container_width=True)
 
-        # Question vs Statement Analysis
-        st.markdown("---")
-        st.subheader("❓ Question vs Statement Analysis")
-
-        questions, statements, q_percent, s_percent = helper.question_vs_statement(df, selected_user)
-
-        col1, col2 = st.columns(2)
-
-        with col1:
-            st.markdown("### 📊 Overall Ratio")
-
-            # Create metrics
-            metric_col1, metric_col2 = st.columns(2)
-            with metric_col1:
-                st.metric("❓ Questions", questions, f"{q_percent}%")
-            with metric_col2:
-                st.metric("💬 Statements", statements, f"{s_percent}%")
-
-            # Pie chart for selected user
-            fig = px.pie(
-                values=[questions, statements],
-                names=['Questions', 'Statements'],
-                title=f"{selected_user}'s Communication Style",
-                hole=0.4,
-                color_discrete_sequence=['#667eea', '#764ba2']
-            )
-            fig.update_traces(textposition='inside', textinfo='percent+label', textfont_size=14)
-            fig.update_layout(showlegend=True, height=400)
-            st.plotly_chart(fig, use_container_width=True)
-
-        with col2:
-            st.markdown("### 👥 User Comparison")
-
-            if selected_user == "over all":
-                # Show all users comparison
-                user_qs_df = helper.user_question_statement_analysis(df)
-                st.dataframe(user_qs_df, use_container_width=True, height=400)
-
-                # Bar chart
-                fig = px.bar(
-                    user_qs_df.head(10),
-                    x='user',
-                    y='question_percentage',
-                    title='Top 10 Users by Question Percentage',
-                    labels={'question_percentage': 'Question %', 'user': 'User'},
-                    color='question_percentage',
-                    color_continuous_scale='viridis',
-                    text='question_percentage'
-                )
-                fig.update_traces(texttemplate='%{text:.1f}%', textposition='outside')
-                fig.update_layout(
-                    xaxis_tickangle=-45,
-                    height=400,
-                    xaxis={'type': 'category'},
-                    showlegend=False
-                )
-                st.plotly_chart(fig, use_container_width=True)
-            else:
-                # Show top 10 users for comparison
-                user_qs_df = helper.user_question_statement_analysis(df)
-                st.dataframe(user_qs_df.head(10), use_container_width=True, height=400)
+            with col2:
+                st.markdown("### 👥 User Comparison")
+
+                if selected_user == "over all":
+                    # Show all users comparison
+                    user_qs_df = helper.user_question_statement_analysis(chat_view)
+                    st.dataframe(user_qs_df, use_container_width=True, height=400)
+
+                    # Bar chart
+                    fig = px.bar(
+                        user_qs_df.head(10),
+                        x='user',
+                        y='question_percentage',
+                        title='Top 10 Users by Question Percentage',
+                        labels={'question_percentage': 'Question %', 'user': 'User'},
+                        color='question_percentage',
+                        color_continuous_scale='viridis',
+                        text='question_percentage'
+                    )
+                    fig.update_traces(texttemplate='%{text:.1f}%', textposition='outside')
+                    fig.update_layout(
+                        xaxis_tickangle=-45,
+                        height=400,
+                        xaxis={'type': 'category'},
+                        showlegend=False
+                    )
+                    st.plotly_chart(fig, use_container_width=True)
+                else:
+                    # Show top 10 users for comparison
+                    user_qs_df = helper.user_question_statement_analysis(chat_view)
+                    st.dataframe(user_qs_df.head(10), use_container_width=True, height=400)
 
-                st.info(f"💡 **Insight:** {selected_user} asks questions {q_percent}% of the time. " +
-                        ("This user is very inquisitive! 🤔" if q_percent > 30 else
-                         "This user makes more statements. 💭" if q_percent < 15 else
-                         "Balanced communication style. ⚖️"))
+                    st.info(f"💡 **Insight:** {selected_user} asks questions {q_percent}% of the time. " +
+                            ("This user is very inquisitive! 🤔" if q_percent > 30 else
+                             "This user makes more statements. 💭" if q_percent < 15 else
+                             "Balanced communication style. ⚖️"))
 
     else:
         # Welcome screen with animation
@@ -678,6 +799,52 @@ Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
             </div>
             """, unsafe_allow_html=True)
 
+    # Performance panel: where the time went, per stage
+    if show_performance:
+        st.markdown("---")
+        with st.expander("⏱️ Performance", expanded=True):
+            col1, col2 = st.columns(2)
+            with col1:
+                st.markdown("### 📂 Loading this chat")
+                load_timings = st.session_state.load_timings.get(st.session_state.chat_hash)
+                if load_timings:
+                    st.dataframe(timings_table(load_timings), use_container_width=True)
+                else:
+                    st.info("Loaded from the in-memory cache, nothing was parsed.")
+            with col2:
+                st.markdown("### 🔄 This rerun")
+                run_timings = run_timer.finish()
+                if run_timings:
+                    st.dataframe(timings_table(run_timings), use_container_width=True)
+                else:
+                    st.info("Click ANALYZE CHAT to time the analysis.")
+
+    # Hidden debug panel (open the app with ?debug=1): per-function metrics of preprocess
+    # and the helper analytics, collected across all sessions of this server process
+    if st.query_params.get('debug') == '1':
+        st.markdown("---")
+        with st.expander("🛠️ Hot-path metrics", expanded=True):
+            recording = st.checkbox("Record metrics (process-wide)", value=METRICS.enabled, key="metrics_check")
+            if recording and not METRICS.enabled:
+                METRICS.enable()
+            elif not recording and METRICS.enabled:
+                METRICS.disable()
+
+            snapshot = METRICS.snapshot()
+            if snapshot:
+                st.dataframe(metrics_table(snapshot), use_container_width=True)
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.download_button("📥 Download metrics JSON", json.dumps(snapshot, indent=2),
+                                       file_name="metrics.json", mime="application/json")
+                with col2:
+                    if st.button("🧹 Reset metrics"):
+                        METRICS.reset()
+                        st.rerun()
+            else:
+                st.info("Nothing recorded yet. Tick the box above (or start the app with "
+                        "WP_CHAT_METRICS=1) and analyze a chat.")
+
 else:
     # No data loaded
     st.markdown("""
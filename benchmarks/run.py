@@ -0,0 +1,187 @@
+"""
+Benchmark suite: parsing, feature extraction, indexing and every helper analytic
+on synthetic exports of several sizes, timed and (optionally) memory-profiled.
+
+    python -m benchmarks.run --sizes 10000 100000 1000000 --out bench.json
+
+Results go to one JSON file per run, so two commits can be compared side by side.
+Each helper is timed cold, on a fresh ChatIndex, so memoized results don't hide its cost.
+Peak memory is tracemalloc's peak for the step: Python and NumPy allocations are
+traced, Arrow buffers (string[pyarrow] columns) are not.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import helper
+from chat_index import OVERALL, ChatIndex
+from features import extract_features
+from preprocess import preprocess
+
+from benchmarks.synth import DATE_FORMATS, SYNTH_VERSION, write_export
+
+DEFAULT_SIZES = [10_000, 100_000]
+
+# helper analytics, each called as fn(chat, user)
+HELPERS = {
+    "fetch_stats": lambda chat, user: helper.fetch_stats(user, chat),
+    "link_domain_stats": lambda chat, user: helper.link_domain_stats(user, chat),
+    "show_top_user": lambda chat, user: helper.show_top_user(chat),
+    "top_users": lambda chat, user: helper.top_users(chat),
+    "most_common_words": lambda chat, user: helper.most_common_words(chat, user),
+    "wc_stats": lambda chat, user: helper.wc_stats(user, chat),
+    "emojies": lambda chat, user: helper.emojies(user, chat),
+    "monthly_timeline": lambda chat, user: helper.monthly_timeline(chat, user),
+    "daily_timeline": lambda chat, user: helper.daily_timeline(chat, user),
+    "week_activity_map": lambda chat, user: helper.week_activity_map(chat, user),
+    "month_activity_map": lambda chat, user: helper.month_activity_map(chat, user),
+    "show_heatmap": lambda chat, user: helper.show_heatmap(chat, user),
+    "question_vs_statement": lambda chat, user: helper.question_vs_statement(chat, user),
+    "user_question_statement_analysis": lambda chat, user: helper.user_question_statement_analysis(chat),
+}
+
+# helpers that don't take a user; run once instead of per user
+CHAT_WIDE = {"show_top_user", "top_users", "user_question_statement_analysis"}
+
+# URLExtract over every message: minutes at 1M messages, so only timed on request
+STRICT_HELPERS = {
+    "fetch_stats_strict_links": lambda chat, user: helper.fetch_stats(user, chat, strict_links=True),
+}
+
+
+def measure(fn, setup=None, repeat=1, memory=True):
+    """
+    Best wall time of `repeat` calls of fn(setup()) plus, if `memory`, the tracemalloc
+    peak of one more call. `setup` runs outside the timing.
+    """
+    times = []
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        gc.collect()
+        start = time.perf_counter()
+        fn(arg)
+        times.append(time.perf_counter() - start)
+
+    result = {"seconds": round(min(times), 6)}
+    if memory:
+        arg = setup() if setup else None
+        gc.collect()
+        tracemalloc.start()
+        try:
+            fn(arg)
+            result["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def export_path(data_dir, size, date_format, seed):
+    """Generate (once) and return the synthetic export for these parameters."""
+    path = os.path.join(data_dir, f"synth_v{SYNTH_VERSION}_{size}_{date_format}_{seed}.txt")
+    if not os.path.exists(path):
+        print(f"generating {path}", file=sys.stderr)
+        write_export(path + ".tmp", size, date_format=date_format, seed=seed)
+        os.replace(path + ".tmp", path)
+    return path
+
+
+def bench_parse(raw, record, repeat, memory, workers):
+    """Time preprocess() on the export's bytes and return the parsed frame."""
+    record("preprocess", None, measure(lambda _: preprocess(raw, compact=True), repeat=repeat, memory=memory))
+    if workers and workers > 1:
+        record(f"preprocess_workers_{workers}", None,
+               measure(lambda _: preprocess(raw, compact=True, workers=workers), repeat=repeat, memory=memory))
+    return preprocess(raw, compact=True)
+
+
+def bench_size(path, size, date_format, repeat, memory, workers, helpers=HELPERS):
+    rows = []
+
+    def record(step, user, stats):
+        rows.append({"size": size, "format": date_format, "step": step, "user": user, **stats})
+        print(f"{size:>10} {date_format:<14} {step:<34} {user or '':<12} {stats['seconds']:.4f}s", file=sys.stderr)
+
+    # the export's bytes only live inside bench_parse(), not through the helper runs
+    with open(path, "rb") as f:
+        df = bench_parse(f.read(), record, repeat, memory, workers)
+    record("extract_features", None, measure(lambda _: extract_features(df), repeat=repeat, memory=memory))
+
+    featured = extract_features(df)
+    record("chat_index", None, measure(lambda _: ChatIndex(featured), repeat=repeat, memory=memory))
+
+    # per-user helpers run for "over all" and for the busiest user (recorded as "user")
+    busiest = str(featured["user"].value_counts().index[0])
+    for name, fn in helpers.items():
+        for user in ([OVERALL] if name in CHAT_WIDE else [OVERALL, busiest]):
+            stats = measure(lambda chat: fn(chat, user), setup=lambda: ChatIndex(featured),
+                            repeat=repeat, memory=memory)
+            record(name, "user" if user != OVERALL else OVERALL, stats)
+
+    return rows
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark parsing and helper analytics on synthetic exports.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="messages per export")
+    parser.add_argument("--formats", nargs="+", choices=sorted(DATE_FORMATS), default=["dmy_24h"],
+                        help="header layouts to generate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per step (best is kept)")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc peak runs")
+    parser.add_argument("--workers", type=int, default=None, help="also time preprocess(workers=N)")
+    parser.add_argument("--strict-links", action="store_true", help="also time the URLExtract link count (slow)")
+    parser.add_argument("--data-dir", default=os.path.join("benchmarks", "data"),
+                        help="where generated exports are kept between runs")
+    parser.add_argument("--out", default=None, help="results JSON (default: benchmarks/results/<commit>.json)")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    commit = git_commit()
+    helpers = {**HELPERS, **STRICT_HELPERS} if args.strict_links else HELPERS
+
+    results = []
+    for size in args.sizes:
+        for date_format in args.formats:
+            path = export_path(args.data_dir, size, date_format, args.seed)
+            results.extend(bench_size(path, size, date_format, args.repeat, not args.no_memory,
+                                      args.workers, helpers))
+
+    report = {
+        "commit": commit,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "repeat": args.repeat,
+        "results": results,
+    }
+
+    out = args.out or os.path.join("benchmarks", "results", f"{commit or 'unknown'}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
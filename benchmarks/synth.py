@@ -0,0 +1,137 @@
+"""
+Deterministic synthetic WhatsApp exports for benchmarking.
+
+The same (messages, users, date format, seed) always produces the same bytes. Exports
+contain multi-line messages, emoji (including ZWJ sequences and skin tones), links,
+media placeholders, questions and system lines, in any of the header layouts
+preprocess() understands.
+
+    python -m benchmarks.synth 1000000 -o big_chat.txt --format us_12h
+"""
+import argparse
+import math
+import random
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Iterator, Optional
+
+# Bump whenever the generated text changes, so exports kept by benchmarks.run are regenerated
+SYNTH_VERSION = 2
+
+# header layouts: (date format, time format) as strftime patterns
+DATE_FORMATS = {
+    "dmy_24h": ("%d/%m/%Y", "%H:%M"),
+    "dmy_short_12h": ("%d/%m/%y", "%I:%M %p"),
+    "us_12h": ("%m/%d/%y", "%I:%M %p"),
+    "dotted_24h": ("%d.%m.%Y", "%H:%M"),
+    "dashed_24h": ("%d-%m-%Y", "%H:%M"),
+}
+
+WORDS = (
+    "hi hello ok okay yes no bro class exam today tomorrow tonight assignment notes "
+    "project submit please thanks thank you sure wait coming done good morning night "
+    "college lab sir madam practical viva marks result semester fees holiday party "
+    "movie game phone call meet canteen library bus train late early ready check send "
+    "group photo video link file pdf question answer problem solution code python java"
+).split()
+
+EMOJIS = ["😂", "🤣", "❤️", "👍", "🙏", "😭", "🔥", "😅", "👍🏽", "🎉", "😎", "🤔",
+          "👨‍👩‍👧", "🏳️‍🌈", "🇮🇳", "1️⃣", "✅", "💯"]
+
+LINKS = ["https://www.youtube.com/watch?v={n}", "https://drive.google.com/file/d/{n}/view",
+         "https://github.com/example/repo{n}", "www.example.com/page{n}", "https://forms.gle/{n}",
+         "wikipedia.org/wiki/Item_{n}"]
+
+# only the placeholders features.MEDIA_MESSAGES counts as media, so the media mix matches the app's
+MEDIA = ["<Media omitted>", "Media omitted"]
+
+SYSTEM_LINES = ["{a} added {b}", "{a} left", "{a} changed this group's icon",
+                "{a} changed the subject to \"Batch {n}\"", "{a} joined using this group's invite link",
+                "Messages and calls are end-to-end encrypted. No one outside of this chat can read them."]
+
+START = datetime(2020, 1, 1, 8, 0)
+
+
+def default_users(messages: int) -> int:
+    """A group size that grows slowly with chat length (5 for tiny chats, 250 at most)."""
+    return max(5, min(250, int(math.sqrt(messages) / 4)))
+
+
+def _message(rng: random.Random, n: int) -> str:
+    kind = rng.random()
+    if kind < 0.06:
+        return rng.choice(MEDIA)
+
+    words = rng.choices(WORDS, k=rng.randint(1, 14))
+    if kind < 0.14:
+        words.insert(rng.randrange(len(words) + 1), rng.choice(LINKS).format(n=n))
+    if rng.random() < 0.25:
+        words.append("".join(rng.choices(EMOJIS, k=rng.randint(1, 3))))
+    text = " ".join(words)
+    if rng.random() < 0.15:
+        text += "?"
+    if rng.random() < 0.05:
+        # continuation lines never look like a header
+        extra = [" ".join(rng.choices(WORDS, k=rng.randint(1, 8))) for _ in range(rng.randint(1, 3))]
+        text = "\n".join([text] + extra)
+    return text
+
+
+def iter_lines(messages: int, users: Optional[int] = None, date_format: str = "dmy_24h",
+               seed: int = 0) -> Iterator[str]:
+    """Yield the export's text one message (header plus continuation lines) at a time."""
+    date_fmt, time_fmt = DATE_FORMATS[date_format]
+    rng = random.Random(seed)
+    names = [f"User {i:03d}" for i in range(users or default_users(messages))]
+    # a few people do most of the talking
+    cum_weights = list(accumulate(1 / (rank + 1) for rank in range(len(names))))
+
+    ts = START
+    for n in range(messages):
+        # bursts of chat with occasional quiet hours/days
+        ts += timedelta(seconds=int(rng.expovariate(1 / 900)) + 1)
+        time_str = ts.strftime(time_fmt)
+        if "%p" in time_fmt and n % 2:
+            # newer exports write "9:05\u202fpm", older ones "9:05 PM"
+            time_str = time_str.replace(" ", "\u202f").lower()
+        header = f"{ts.strftime(date_fmt)}, {time_str} - "
+
+        if rng.random() < 0.01:
+            a, b = rng.sample(names, 2)
+            yield header + rng.choice(SYSTEM_LINES).format(a=a, b=b, n=n) + "\n"
+        else:
+            yield f"{header}{rng.choices(names, cum_weights=cum_weights)[0]}: {_message(rng, n)}\n"
+
+
+def generate_export(messages: int, users: Optional[int] = None, date_format: str = "dmy_24h",
+                    seed: int = 0) -> bytes:
+    """The whole synthetic export as UTF-8 bytes (see write_export() for very large ones)."""
+    return "".join(iter_lines(messages, users, date_format, seed)).encode("utf-8")
+
+
+def write_export(path: str, messages: int, users: Optional[int] = None, date_format: str = "dmy_24h",
+                 seed: int = 0, batch: int = 100_000) -> None:
+    """Stream a synthetic export to `path` without holding it in memory."""
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        buf = []
+        for line in iter_lines(messages, users, date_format, seed):
+            buf.append(line)
+            if len(buf) >= batch:
+                f.write("".join(buf))
+                buf.clear()
+        f.write("".join(buf))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a deterministic synthetic WhatsApp export.")
+    parser.add_argument("messages", type=int, help="number of messages (e.g. 10000 .. 10000000)")
+    parser.add_argument("-o", "--out", required=True, help="output .txt path")
+    parser.add_argument("-u", "--users", type=int, default=None, help="group size (default: grows with length)")
+    parser.add_argument("--format", choices=sorted(DATE_FORMATS), default="dmy_24h", help="header date/time layout")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    write_export(args.out, args.messages, args.users, args.format, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, List, NamedTuple, Optional, Tuple
+
+import pandas as pd
+
+
+def content_hash(data: bytes) -> str:
+    """Stable key for a chat export: blake2b digest of its raw bytes."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+# Leading bytes hashed separately, so most non-matching exports are ruled out cheaply
+HEAD_BYTES = 64 * 1024
+
+
+class Fingerprint(NamedTuple):
+    """Size and digests of an export, enough to tell whether a later re-export starts with it."""
+    size: int
+    head: str
+    digest: str
+
+    @classmethod
+    def of(cls, raw: bytes) -> "Fingerprint":
+        return cls(len(raw), content_hash(raw[:HEAD_BYTES]), content_hash(raw))
+
+    def is_prefix_of(self, raw: bytes) -> bool:
+        if len(raw) < self.size:
+            return False
+        view = memoryview(raw)
+        return (content_hash(view[:min(HEAD_BYTES, self.size)]) == self.head
+                and content_hash(view[:self.size]) == self.digest)
+
+
+class LRUCache:
+    """
+    Small thread-safe LRU mapping with a bounded number of entries.
+    Streamlit runs every session in its own script thread, so all access goes through a lock.
+    """
+
+    def __init__(self, maxsize: int = 8):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        """Snapshot of the entries, most recently used last (doesn't touch their recency)."""
+        with self._lock:
+            return list(self._data.items())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+
+class BytesLRUCache(LRUCache):
+    """
+    LRU of bytes values (e.g. rendered chart PNGs) bounded by their total size
+    rather than by entry count; a value larger than the whole budget isn't kept.
+    """
+
+    def __init__(self, maxbytes: int):
+        super().__init__(maxsize=0)
+        self.maxbytes = maxbytes
+        self.nbytes = 0
+
+    def put(self, key: Hashable, value: bytes) -> None:
+        with self._lock:
+            if key in self._data:
+                self.nbytes -= len(self._data.pop(key))
+            if len(value) > self.maxbytes:
+                return
+            self._data[key] = value
+            self.nbytes += len(value)
+            while self.nbytes > self.maxbytes:
+                _, evicted = self._data.popitem(last=False)
+                self.nbytes -= len(evicted)
+
+    def pop(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        with self._lock:
+            value = self._data.pop(key, None)
+            if value is None:
+                return default
+            self.nbytes -= len(value)
+            return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.nbytes = 0
+
+
+# ============================================
+#      ON-DISK FRAME CACHE (ARROW / FEATHER)
+# ============================================
+# schema metadata entry holding df.attrs (pandas doesn't round-trip them through Feather)
+ATTRS_KEY = b"wp_chat_attrs"
+
+
+def frame_path(cache_dir: str, key: str) -> str:
+    return os.path.join(cache_dir, f"{key}.feather")
+
+
+def load_frame(path: str) -> Optional[pd.DataFrame]:
+    """
+    Memory-map a cached frame written by save_frame(); None if it isn't there or is unreadable.
+    string[pyarrow] columns are rebuilt straight from the mapped Arrow buffers,
+    and the frame's attrs (e.g. the sniffed date formats) are restored.
+    """
+    if not os.path.exists(path):
+        return None
+
+    from pyarrow import feather
+
+    try:
+        table = feather.read_table(path, memory_map=True)
+    except Exception:
+        return None
+
+    meta = table.schema.pandas_metadata or {}
+    string_cols = [c["name"] for c in meta.get("columns", []) if c.get("numpy_type") == "string"]
+
+    df = table.drop_columns(string_cols).to_pandas()
+    for name in string_cols:
+        df[name] = pd.arrays.ArrowStringArray(table.column(name))
+
+    df = df[table.column_names]
+    attrs = (table.schema.metadata or {}).get(ATTRS_KEY)
+    if attrs is not None:
+        df.attrs.update(json.loads(attrs))
+    return df
+
+
+def save_frame(df: pd.DataFrame, path: str) -> None:
+    """Write `df` uncompressed (so it can be memory-mapped), atomically replacing any old file."""
+    import pyarrow as pa
+    from pyarrow import feather
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if df.attrs:
+        metadata = dict(table.schema.metadata or {})
+        metadata[ATTRS_KEY] = json.dumps(df.attrs).encode("utf-8")
+        table = table.replace_schema_metadata(metadata)
+
+    cache_dir = os.path.dirname(path) or "."
+    os.makedirs(cache_dir, exist_ok=True)
+
+    fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    os.close(fd)
+    try:
+        feather.write_feather(table, tmp, compression="uncompressed")
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
@@ -0,0 +1,130 @@
+"""
+Chart builders for the dashboard.
+
+Every function takes plain data and returns its own matplotlib Figure. Nothing here
+touches pyplot's global "current figure" state, so Streamlit sessions (one script
+thread each) can build and render charts concurrently, and figures never pile up in
+pyplot's registry. A Figure and its Axes reference each other, though, so an unused
+figure waits for the cyclic garbage collector; call fig.clear() once it has been
+rasterized (as app.py does after figure_png()) to release its artists right away.
+"""
+import io
+
+import matplotlib
+import numpy as np
+import seaborn as sns
+from matplotlib.figure import Figure
+
+# Dashboard look, applied once per process: rcParams are read as each Figure is created,
+# so nothing has to be switched per session or per chart
+STYLE = 'dark_background'
+matplotlib.style.use(STYLE)
+
+# first series in the dashboard colours, the compared user in the second
+LINE_STYLES = [
+    {'color': '#667eea', 'marker': 'o'},
+    {'color': '#764ba2', 'marker': 's'},
+]
+DAY_COLORS = ['#667eea', '#764ba2', '#f093fb', '#4facfe', '#43e97b', '#fa709a', '#fee140']
+MONTH_COLORS = ['#fa709a', '#fee140', '#30cfd0', '#667eea', '#f093fb', '#4facfe']
+TOP_USER_COLORS = ["red", "green", "blue", "orange", "purple"]
+
+LABEL_STYLE = {'fontsize': 12, 'fontweight': 'bold'}
+
+
+def _rotate_xticks(ax, rotation=45, ha='right'):
+    for label in ax.get_xticklabels():
+        label.set_rotation(rotation)
+        label.set_horizontalalignment(ha)
+
+
+def figure_png(fig, dpi=150):
+    """Rasterize `fig` to PNG bytes (Agg, via savefig)."""
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', bbox_inches='tight', dpi=dpi)
+    return buf.getvalue()
+
+
+def timeline_chart(lines, linewidth=2.5, markersize=8):
+    """
+    Messages over time, one line per (label, timeline) pair; each timeline has
+    'date' and 'message' columns. A legend is added when there's more than one line.
+    """
+    fig = Figure(figsize=(14, 6))
+    ax = fig.subplots()
+    for (label, timeline), style in zip(lines, LINE_STYLES):
+        ax.plot(timeline['date'], timeline['message'], linewidth=linewidth,
+                markersize=markersize, label=label, **style)
+    if len(lines) > 1:
+        ax.legend(fontsize=12, frameon=True, shadow=True)
+
+    ax.grid(True, alpha=0.3, linestyle='--')
+    _rotate_xticks(ax)
+    ax.set_xlabel("Date", **LABEL_STYLE)
+    ax.set_ylabel("No of Messages", **LABEL_STYLE)
+    fig.tight_layout()
+    return fig
+
+
+def activity_bar_chart(counts, colors, xlabel):
+    """Bar chart of a label -> message count series (most active days / months)."""
+    fig = Figure(figsize=(8, 6))
+    ax = fig.subplots()
+    ax.bar(counts.index, counts.values, color=colors[:len(counts)])
+    ax.set_xlabel(xlabel, **LABEL_STYLE)
+    ax.set_ylabel("Number of Messages", **LABEL_STYLE)
+    ax.grid(axis='y', alpha=0.3, linestyle='--')
+    _rotate_xticks(ax)
+    fig.tight_layout()
+    return fig
+
+
+def heatmap_chart(pivot_df):
+    """Day x time-period heatmap of message counts (see helper.show_heatmap)."""
+    fig = Figure(figsize=(20, 7))
+    ax = fig.subplots()
+    sns.heatmap(pivot_df, annot=True, fmt='.0f', cmap='RdYlGn', linewidths=0.5,
+                cbar_kws={'label': 'Message Count'}, ax=ax)
+    _rotate_xticks(ax)
+    ax.tick_params(axis='y', labelrotation=0)
+    ax.set_xlabel("Time Period", **LABEL_STYLE)
+    ax.set_ylabel("Day Name", **LABEL_STYLE)
+    ax.set_title("Heatmap of Messages by Day and Period", fontsize=14, fontweight='bold', pad=20)
+    fig.tight_layout()
+    return fig
+
+
+def top_users_chart(counts):
+    """Bar chart of the busiest users' message counts."""
+    fig = Figure()
+    ax = fig.subplots()
+    ax.bar(counts.index, counts.values, color=TOP_USER_COLORS[:len(counts)])
+    _rotate_xticks(ax, rotation=90, ha='center')
+    ax.set_xlabel("user name")
+    ax.set_ylabel("number of messages")
+    return fig
+
+
+def wordcloud_chart(wc):
+    """A generated WordCloud as a figure."""
+    fig = Figure(figsize=(10, 8))
+    ax = fig.subplots()
+    ax.imshow(wc, interpolation='bilinear')
+    ax.axis('off')
+    fig.tight_layout()
+    return fig
+
+
+def common_words_chart(words):
+    """Horizontal bars of the most common words (a 'word' / 'count' frame), most frequent on top."""
+    colors = matplotlib.colormaps['viridis'](np.linspace(0, 1, len(words)))
+
+    fig = Figure(figsize=(12, 10))
+    ax = fig.subplots()
+    ax.barh(words['word'], words['count'], color=colors)
+    ax.invert_yaxis()
+    ax.set_xlabel("Frequency", **LABEL_STYLE)
+    ax.set_ylabel("Words", **LABEL_STYLE)
+    ax.grid(axis='x', alpha=0.3, linestyle='--')
+    fig.tight_layout()
+    return fig
@@ -0,0 +1,303 @@
+import copy
+from collections import Counter
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from cache import Fingerprint, LRUCache
+
+OVERALL = "over all"
+
+# date-range views kept per chat (each carries its own memoized results)
+RANGE_CACHE_SIZE = 8
+
+# activity cube layout: month x weekday x hour
+CUBE_SHAPE = (12, 7, 24)
+CUBE_CELLS = 12 * 7 * 24
+
+
+def _cube_cells(df: pd.DataFrame) -> np.ndarray:
+    """Flat (month, weekday, hour) cell number of every row."""
+    ts = df["timestamp"].dt
+    return ((ts.month.to_numpy() - 1) * 7 + ts.dayofweek.to_numpy()) * 24 + ts.hour.to_numpy()
+
+
+def activity_cube(df: pd.DataFrame) -> np.ndarray:
+    """12 x 7 x 24 (month x weekday x hour) message counts of a frame."""
+    return np.bincount(_cube_cells(df), minlength=CUBE_CELLS).reshape(CUBE_SHAPE)
+
+
+def _concat(head: pd.DataFrame, tail: pd.DataFrame) -> pd.DataFrame:
+    """`head` followed by `tail`; categorical columns get the union of both categories so they stay categorical."""
+    tail = tail[head.columns]
+    dtypes = {}
+    for col in head.columns:
+        dtype = head[col].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            extra = pd.Index(tail[col].dropna().unique()).difference(dtype.categories, sort=False)
+            if len(extra):
+                categories = dtype.categories.append(extra)
+                # unordered categories stay sorted, as astype("category") would leave them
+                if not dtype.ordered:
+                    categories = categories.sort_values()
+                dtype = pd.CategoricalDtype(categories, ordered=dtype.ordered)
+            dtypes[col] = dtype
+    df = pd.concat([head.astype(dtypes), tail.astype(dtypes)], ignore_index=True)
+    df.attrs = dict(head.attrs)
+    return df
+
+
+def _regrid(values: np.ndarray, users: list, positions: dict) -> np.ndarray:
+    """Per-user rows of `values` (in `users` order) moved to their rows in `positions`."""
+    out = np.zeros((len(positions),) + values.shape[1:], dtype=values.dtype)
+    out[[positions[u] for u in users]] = values
+    return out
+
+
+class Rollup:
+    """
+    Per-user daily message counts as a dense users x days matrix.
+
+    Weekly/monthly/yearly series are contiguous reductions (np.add.reduceat) of one row,
+    so compare mode and date ranges are array slicing instead of fresh groupbys.
+    """
+
+    FREQS = ("D", "W", "M", "Y")
+
+    def __init__(self, counts: np.ndarray, days: pd.DatetimeIndex, positions: dict):
+        self.counts = counts
+        self.days = days
+        self.positions = positions
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, codes: np.ndarray = None, users: list = None) -> "Rollup":
+        """Count `df` per (user, day); without codes all rows go into a single "over all" row."""
+        if codes is None:
+            codes, users = np.zeros(len(df), dtype=np.intp), [OVERALL]
+
+        if len(df) == 0:
+            days = pd.DatetimeIndex([])
+            return cls(np.zeros((len(users), 0), dtype=np.int32), days, {u: i for i, u in enumerate(users)})
+
+        dates = df["date"].to_numpy()
+        first, last = dates.min(), dates.max()
+        n_days = int((last - first) // np.timedelta64(1, "D")) + 1
+        day_idx = (dates - first) // np.timedelta64(1, "D")
+
+        counts = np.bincount(codes * n_days + day_idx, minlength=len(users) * n_days)
+        days = pd.date_range(first, periods=n_days, freq="D")
+        return cls(counts.reshape(len(users), n_days).astype(np.int32), days, {u: i for i, u in enumerate(users)})
+
+    def row(self, selected_user: str) -> np.ndarray:
+        """Daily counts of one user, or of everyone for "over all"."""
+        if selected_user == OVERALL and OVERALL not in self.positions:
+            return self.counts.sum(axis=0)
+        if selected_user not in self.positions:
+            return np.zeros(len(self.days), dtype=self.counts.dtype)
+        return self.counts[self.positions[selected_user]]
+
+    def series(self, selected_user: str, freq: str = "D") -> pd.Series:
+        """Message counts per day/week/month/year, indexed by the period's first day."""
+        if freq not in self.FREQS:
+            raise ValueError(f"freq must be one of {self.FREQS}")
+        row = self.row(selected_user)
+        if freq == "D" or len(self.days) == 0:
+            return pd.Series(row, index=self.days, name="message")
+
+        periods = self.days.to_period(freq)
+        starts = np.flatnonzero(np.r_[True, periods[1:] != periods[:-1]])
+        index = periods[starts].to_timestamp()
+        return pd.Series(np.add.reduceat(row, starts), index=index, name="message")
+
+    def between(self, start: np.datetime64, end: np.datetime64) -> "Rollup":
+        """Days in [start, end) as a column slice of the same matrix."""
+        a, b = self.days.searchsorted([start, end])
+        return Rollup(self.counts[:, a:b], self.days[a:b], self.positions)
+
+    def merged(self, other: "Rollup", users: list) -> "Rollup":
+        """Sum of two rollups over the union of their days, with one row per entry of `users`."""
+        parts = [r for r in (self, other) if len(r.days)]
+        positions = {u: i for i, u in enumerate(users)}
+        if not parts:
+            return Rollup(np.zeros((len(users), 0), dtype=np.int32), pd.DatetimeIndex([]), positions)
+
+        days = pd.date_range(min(r.days[0] for r in parts), max(r.days[-1] for r in parts), freq="D")
+        counts = np.zeros((len(users), len(days)), dtype=np.int32)
+        for r in parts:
+            a = days.get_loc(r.days[0])
+            counts[:, a:a + len(r.days)] += _regrid(r.counts, list(r.positions), positions)
+        return Rollup(counts, days, positions)
+
+
+class ChatIndex:
+    """
+    Per-user index over a parsed chat, built once after preprocess().
+
+    Rows are stably sorted by user into `by_user`, so every user's messages form one
+    contiguous, still time-ordered block and view(user) is an O(1) iloc slice
+    instead of an O(N) boolean scan of the whole frame.
+    between() narrows that to a date range with a searchsorted on the sorted timestamps,
+    and extend() appends the new tail of a re-exported chat without recomputing the rest.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        if df.empty:
+            raise ValueError("cannot index a chat without messages")
+        # date ranges are found by searchsorted, so keep the frame time-ordered
+        # (exports already are, apart from the odd clock change)
+        if not df["timestamp"].is_monotonic_increasing:
+            df = df.sort_values("timestamp", kind="stable").reset_index(drop=True)
+        self.df = df
+
+        codes, users = pd.factorize(df["user"], sort=True)
+        order = np.argsort(codes, kind="stable")
+        self.by_user = df.iloc[order]
+
+        self.codes = codes
+        counts = np.bincount(codes, minlength=len(users))
+        stops = np.cumsum(counts)
+        starts = stops - counts
+        self.users = [str(u) for u in users]
+        self.offsets = {u: (int(a), int(b)) for u, a, b in zip(self.users, starts, stops)}
+        self.positions = {u: i for i, u in enumerate(self.users)}
+        self._by_user_ts = self.by_user["timestamp"].to_numpy()
+
+        # [start, end) of a date-range view, see between()
+        self.bounds = None
+        self._parent = None
+        self._ranges = LRUCache(maxsize=RANGE_CACHE_SIZE)
+
+        # derived per-chat results (e.g. per-user emoji tables), see memo()
+        self._memo = {}
+
+        # the export this chat was parsed from and its date/time layout, see extend()
+        self.source: Optional[Fingerprint] = None
+        formats = df.attrs.get("formats")
+        self.formats = tuple(formats) if formats is not None else None
+
+    @property
+    def span(self) -> Tuple[Optional[pd.Timestamp], Optional[pd.Timestamp]]:
+        """First and last message timestamps of the (possibly date-restricted) chat."""
+        if self.df.empty:
+            return None, None
+        return self.df["timestamp"].iloc[0], self.df["timestamp"].iloc[-1]
+
+    def between(self, start=None, end=None) -> "ChatIndex":
+        """
+        The chat restricted to calendar days start..end (inclusive; None = open-ended).
+        Rows are located with searchsorted, views stay zero-copy slices, and each range
+        keeps its own memoized results.
+        """
+        root = self._parent or self
+        if start is None and end is None:
+            return root
+
+        lo = pd.Timestamp(start).normalize() if start is not None else pd.Timestamp.min
+        hi = pd.Timestamp(end).normalize() + pd.Timedelta(days=1) if end is not None else pd.Timestamp.max
+        key = (lo, hi)
+
+        sub = root._ranges.get(key)
+        if sub is None:
+            sub = root._restrict(lo.to_datetime64(), hi.to_datetime64())
+            root._ranges.put(key, sub)
+        return sub
+
+    def _restrict(self, lo: np.datetime64, hi: np.datetime64) -> "ChatIndex":
+        a, b = np.searchsorted(self.df["timestamp"].to_numpy(), [lo, hi])
+
+        sub = copy.copy(self)
+        sub.df = self.df.iloc[a:b]
+        sub.codes = self.codes[a:b]
+        sub.bounds = (lo, hi)
+        sub._parent = self
+        sub._ranges = None
+        sub._memo = {}
+        return sub
+
+    def view(self, selected_user: str) -> pd.DataFrame:
+        """Rows of `selected_user` (the whole chat for "over all"), without copying."""
+        if selected_user == OVERALL:
+            return self.df
+        start, stop = self.offsets.get(selected_user, (0, 0))
+        if self.bounds is not None:
+            lo, hi = np.searchsorted(self._by_user_ts[start:stop], self.bounds)
+            start, stop = start + int(lo), start + int(hi)
+        return self.by_user.iloc[start:stop]
+
+    def activity(self, selected_user: str) -> np.ndarray:
+        """12 x 7 x 24 (month x weekday x hour) counts for `selected_user`, sliced from the chat's cube."""
+        cube = self._activity_cube()
+        if selected_user == OVERALL:
+            return self.memo(("activity", OVERALL), lambda chat: chat._activity_cube().sum(axis=0))
+        if selected_user not in self.positions:
+            return np.zeros(CUBE_SHAPE, dtype=cube.dtype)
+        return cube[self.positions[selected_user]]
+
+    def _activity_cube(self) -> np.ndarray:
+        return self.memo("activity_cube", ChatIndex._build_activity_cube)
+
+    def _build_activity_cube(self) -> np.ndarray:
+        # users x month x weekday x hour, one bincount over integer codes
+        cells = self.codes * CUBE_CELLS + _cube_cells(self.df)
+        counts = np.bincount(cells, minlength=len(self.users) * CUBE_CELLS)
+        return counts.reshape((len(self.users),) + CUBE_SHAPE)
+
+    def rollup(self) -> Rollup:
+        """Users x days count matrix of the chat, built on first use (date ranges slice the parent's)."""
+        if self._parent is not None:
+            return self.memo("rollup", lambda chat: chat._parent.rollup().between(*chat.bounds))
+        return self.memo("rollup", lambda chat: Rollup.build(chat.df, chat.codes, chat.users))
+
+    def memo(self, key: Hashable, compute: Callable[["ChatIndex"], Any]) -> Any:
+        """
+        Return the cached result for `key`, computing it as `compute(self)` on first use
+        for the lifetime of the index. `compute` is kept so extend() can run it on just the new tail.
+        """
+        try:
+            return self._memo[key][0]
+        except KeyError:
+            value = compute(self)
+            self._memo[key] = (value, compute)
+            return value
+
+    def extend(self, tail: pd.DataFrame) -> "ChatIndex":
+        """
+        A new index over this chat followed by `tail`, the messages parsed from the end of a
+        re-export (see preprocess(formats=...)); this index is left as it is.
+
+        The per-user order is rebuilt over the combined frame (plain array work), but the
+        memoized results aren't recomputed from zero: each one is computed on the tail alone
+        and merged in -- activity cube and rollup counts are added, Counters updated and
+        token lists extended. Results that can't be merged are dropped and rebuilt on next use.
+        """
+        if self._parent is not None:
+            raise ValueError("extend() works on the whole chat, not a date-range view")
+        if tail.empty:
+            return self
+
+        ext = ChatIndex(_concat(self.df, tail))
+        part = ChatIndex(tail)
+        # order-dependent results (token lists) only carry over when the tail really comes after
+        in_order = self.df.empty or tail["timestamp"].iloc[0] >= self.df["timestamp"].iloc[-1]
+
+        for key, (value, compute) in self._memo.items():
+            if key == "activity_cube":
+                merged = (_regrid(value, self.users, ext.positions)
+                          + _regrid(compute(part), part.users, ext.positions))
+            elif isinstance(value, Rollup):
+                merged = value.merged(compute(part), ext.users)
+            elif isinstance(value, Counter):
+                merged = value.copy()
+                merged.update(compute(part))
+            elif isinstance(value, np.ndarray):
+                merged = value + compute(part)
+            elif isinstance(value, list) and in_order:
+                merged = value + compute(part)
+            else:
+                continue
+            ext._memo[key] = (merged, compute)
+        return ext
+
+    def __len__(self) -> int:
+        return len(self.df)
@@ -0,0 +1,149 @@
+"""
+Headless batch analysis: parse a directory of WhatsApp .txt exports and write
+the helper analytics as JSON (and the parsed chat as Parquet) without Streamlit.
+
+    python cli.py exports/ -o results/ --workers 8
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import helper
+from chat_index import OVERALL, ChatIndex
+from features import extract_features
+from preprocess import preprocess
+
+# users that aren't people
+SKIP_USERS = ('group_notification', 'Meta AI')
+
+
+def _stats(chat, user):
+    num_msgs, num_words, num_media, num_links = helper.fetch_stats(user, chat)
+    questions, statements, q_percent, _ = helper.question_vs_statement(chat, user)
+    return {
+        "messages": num_msgs,
+        "words": num_words,
+        "media": num_media,
+        "links": num_links,
+        "questions": questions,
+        "statements": statements,
+        "question_percentage": q_percent,
+    }
+
+
+def analyze(chat, top=20):
+    """All dashboard analytics of one chat as a JSON-serializable dict."""
+    first_ts, last_ts = chat.span
+    emojis, _ = helper.emojies(OVERALL, chat)
+
+    return {
+        "first_message": first_ts,
+        "last_message": last_ts,
+        "overall": _stats(chat, OVERALL),
+        "users": {u: _stats(chat, u) for u in chat.users if u not in SKIP_USERS},
+        "top_words": helper.most_common_words(chat, OVERALL).head(top).to_dict("records"),
+        "top_emojis": [] if emojis is None else emojis.head(top).to_dict("records"),
+        "link_domains": helper.link_domain_stats(OVERALL, chat, top=top).to_dict("records"),
+        "week_activity": helper.week_activity_map(chat, OVERALL).to_dict(),
+        "month_activity": helper.month_activity_map(chat, OVERALL).to_dict(),
+        "monthly_timeline": helper.monthly_timeline(chat, OVERALL)[["time", "message"]].to_dict("records"),
+        "question_table": helper.user_question_statement_analysis(chat).to_dict("records"),
+    }
+
+
+def analyze_file(path, out_dir, formats=("json", "parquet"), cache_dir=None, name=None):
+    """
+    Parse and analyze one export, write its outputs as `name`.json / `name`.parquet
+    (default: the export's file name); returns a short status record.
+    """
+    name = name or os.path.splitext(os.path.basename(path))[0]
+    start = time.perf_counter()
+
+    try:
+        df = preprocess(path, compact=True, cache_dir=cache_dir)
+        if df.empty:
+            raise ValueError("no messages found")
+        chat = ChatIndex(extract_features(df))
+
+        if "parquet" in formats:
+            chat.df[df.columns].to_parquet(os.path.join(out_dir, f"{name}.parquet"), index=False)
+        if "json" in formats:
+            with open(os.path.join(out_dir, f"{name}.json"), "w", encoding="utf-8") as f:
+                json.dump(analyze(chat), f, ensure_ascii=False, indent=2, default=str)
+    except Exception as e:
+        return {"file": path, "ok": False, "output": name, "error": f"{type(e).__name__}: {e}"}
+
+    return {
+        "file": path,
+        "ok": True,
+        "output": name,
+        "messages": len(chat),
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+def find_exports(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for entry in sorted(os.listdir(path)):
+                if entry.lower().endswith(".txt"):
+                    yield os.path.join(path, entry)
+        else:
+            yield path
+
+
+def output_names(files):
+    """Output name per export: its file name, with -2, -3, ... added when two exports share one."""
+    names, used = [], set()
+    for path in files:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        name, n = stem, 1
+        while name in used:
+            n += 1
+            name = f"{stem}-{n}"
+        used.add(name)
+        names.append(name)
+    return names
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch-analyze WhatsApp chat exports without Streamlit.")
+    parser.add_argument("inputs", nargs="+", help=".txt exports or directories containing them")
+    parser.add_argument("-o", "--out", default="results", help="output directory (default: results)")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(),
+                        help="parallel processes (default: all cores)")
+    parser.add_argument("--format", choices=["json", "parquet", "both"], default="both",
+                        help="what to write per export (default: both)")
+    parser.add_argument("--cache-dir", default=None, help="reuse/populate the on-disk parsed-chat cache")
+    args = parser.parse_args(argv)
+
+    files = list(dict.fromkeys(find_exports(args.inputs)))
+    if not files:
+        parser.error("no .txt exports found")
+
+    os.makedirs(args.out, exist_ok=True)
+    formats = ("json", "parquet") if args.format == "both" else (args.format,)
+
+    results = []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(analyze_file, f, args.out, formats, args.cache_dir, name)
+                   for f, name in zip(files, output_names(files))]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            status = f"{result['messages']} messages in {result['seconds']}s" if result["ok"] else result["error"]
+            print(f"[{len(results)}/{len(files)}] {result['file']}: {status}", file=sys.stderr)
+
+    results.sort(key=lambda r: r["file"])
+    with open(os.path.join(args.out, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+    failed = sum(not r["ok"] for r in results)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+import os
+import re
+import string
+from collections import Counter
+from itertools import chain
+from typing import Optional
+
+import emoji
+import numpy as np
+import pandas as pd
+from urlextract import URLExtract
+
+from timing import ProgressCallback
+
+MEDIA_MESSAGES = ['<Media omitted>', '<media omitted>', 'Media omitted', 'media omitted']
+
+extractor = URLExtract()
+
+# Fast link pattern: anything with a scheme or "www.", plus bare domains on common TLDs.
+# Kept as a plain string (RE2-compatible) so pandas can hand it to Arrow's regex kernels.
+_TLDS = "com|org|net|edu|gov|io|in|co|me|ly|gl|be|app|dev|info|ai|tv|us|uk"
+# A bare domain starts the message or follows whitespace / opening punctuation. Spelled out
+# rather than \b, which is Unicode-aware in Python's re but ASCII-only in RE2 ("naïve.io").
+_LINK_START = r'(?:^|[ \t\n\r\f\v(<\[{"\'*,;:!?])'
+LINK_PATTERN = (
+    r'(?i)(?:https?://|www\.)\S+'
+    r'|' + _LINK_START + r'[a-z0-9][a-z0-9-]*(?:\.[a-z0-9-]+)*\.(?:' + _TLDS + r')\b(?:/\S*)?'
+)
+
+# Same links, capturing only the host part (a subset of LINK_PATTERN's matches)
+DOMAIN_PATTERN = (
+    r'(?i)(?:https?://|www\.)(?:www\.)?(?P<domain>[^\s/:?#]+)\S*'
+    r'|' + _LINK_START + r'(?P<bare>[a-z0-9][a-z0-9-]*(?:\.[a-z0-9-]+)*\.(?:' + _TLDS + r'))\b(?:/\S*)?'
+)
+
+# URL pattern stripped before tokenizing
+URL_PATTERN = r'(https?://\S+|www\.\S+|https\S+)'
+
+# Punctuation remover (as a regex so it runs on the whole column)
+PUNCT_PATTERN = "[" + re.escape(string.punctuation) + "]"
+
+# Stop words ship next to this module; read once at import, not per call / from the CWD
+STOP_WORDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stop_words.txt')
+
+
+def load_stop_words(path: str = STOP_WORDS_PATH) -> frozenset:
+    with open(path, 'r', encoding='utf-8') as f:
+        return frozenset(f.read().splitlines())
+
+
+STOP_WORDS = load_stop_words()
+
+
+# ============================================
+#        EMOJI ENGINE
+# ============================================
+def _char_class(chars) -> str:
+    """Regex character class for `chars`, collapsed into code point ranges."""
+    cps = sorted(map(ord, chars))
+    parts = []
+    start = prev = cps[0]
+    for cp in cps[1:] + [None]:
+        if cp is not None and cp == prev + 1:
+            prev = cp
+            continue
+        parts.append(re.escape(chr(start)) if start == prev else f"{re.escape(chr(start))}-{re.escape(chr(prev))}")
+        if cp is not None:
+            start = prev = cp
+    return "[" + "".join(parts) + "]"
+
+
+_EMOJI_MAX_LEN = max(map(len, emoji.EMOJI_DATA))
+
+# Candidate runs: an emoji start character followed by any joiners, modifiers, selectors or
+# further emoji; keycaps (1️⃣, #️⃣) are matched on their own so plain digits aren't candidates.
+emoji_candidates = re.compile(
+    _char_class({e[0] for e in emoji.EMOJI_DATA if not e[0].isascii()})
+    + _char_class({ch for e in emoji.EMOJI_DATA for ch in e[1:]}) + "*"
+    + "|[0-9#*]\ufe0f?\u20e3"
+)
+
+
+def find_emojis(text: str) -> list:
+    """Full emoji sequences in `text` (ZWJ families, skin tones, flags, keycaps), in order."""
+    found = []
+    for run in emoji_candidates.findall(text):
+        # split each run greedily into the longest known sequences
+        i, n = 0, len(run)
+        while i < n:
+            for size in range(min(_EMOJI_MAX_LEN, n - i), 0, -1):
+                if run[i:i + size] in emoji.EMOJI_DATA:
+                    found.append(run[i:i + size])
+                    i += size
+                    break
+            else:
+                i += 1
+    return found
+
+
+# ============================================
+#        PER-MESSAGE FEATURES
+# ============================================
+def word_counts(messages: pd.Series) -> pd.Series:
+    return messages.str.split().str.len().fillna(0).astype("int32")
+
+
+def link_counts(messages: pd.Series, strict: bool = False) -> pd.Series:
+    """
+    Links per message from one vectorized regex count.
+    strict=True runs URLExtract on every message instead (much slower, catches more bare domains).
+    """
+    if strict:
+        return messages.map(lambda msg: len(extractor.find_urls(msg))).astype("int16")
+    # always counted by Arrow's RE2, so object and string[pyarrow] columns agree (and it's much faster)
+    return messages.astype("string[pyarrow]").str.count(LINK_PATTERN).fillna(0).astype("int16")
+
+
+def link_domains(messages: pd.Series) -> pd.Series:
+    """Link counts per (lower-cased) domain; only the host part of each link is extracted."""
+    found = messages.str.extractall(DOMAIN_PATTERN)
+    if found.empty:
+        return pd.Series(dtype="int64", name="count")
+    domains = found["domain"].fillna(found["bare"]).str.lower()
+    domains = domains.str.replace(r'^www\.', '', regex=True)
+    return domains.value_counts()
+
+
+def media_mask(messages: pd.Series) -> pd.Series:
+    return messages.isin(MEDIA_MESSAGES).astype(bool)
+
+
+def question_mask(messages: pd.Series) -> pd.Series:
+    return messages.str.strip().str.endswith('?').fillna(False).astype(bool)
+
+
+def emoji_lists(messages: pd.Series) -> pd.Series:
+    return messages.map(find_emojis)
+
+
+def emoji_counts(df: pd.DataFrame) -> Counter:
+    """Emoji frequencies of a frame: from the precomputed column, else one scan of the joined messages."""
+    if 'emojis' in df.columns:
+        return Counter(chain.from_iterable(df['emojis']))
+    return Counter(find_emojis("\n".join(df['user_message'])))
+
+
+def token_stream(messages: pd.Series) -> pd.Series:
+    """
+    Every cleaned token of `messages`, one per row and indexed by the message it came from:
+    URLs and punctuation stripped, lower-cased, stop words and media placeholders removed.
+    """
+    text = messages[~media_mask(messages)]
+    words = (
+        text.str.replace(URL_PATTERN, "", regex=True)
+        .str.lower()
+        .str.replace(PUNCT_PATTERN, "", regex=True)
+        .str.split()
+        .explode()
+    )
+    return words[words.notna() & ~words.isin(STOP_WORDS)].astype(object)
+
+
+def token_lists(messages: pd.Series) -> pd.Series:
+    """Cleaned, stop-word-free tokens per message; media placeholders get no tokens."""
+    words = token_stream(messages)
+    # the stream keeps message order, so each message's tokens are one contiguous run
+    rows = messages.index.get_indexer(words.index)
+    bounds = np.searchsorted(rows, np.arange(len(messages) + 1))
+    values = words.to_numpy()
+    return pd.Series(
+        [values[a:b].tolist() for a, b in zip(bounds[:-1], bounds[1:])],
+        index=messages.index, dtype=object
+    )
+
+
+def tokens_of(df: pd.DataFrame) -> list:
+    """Flat token list of a frame: from the precomputed column, else one vectorized pass."""
+    if 'tokens' in df.columns:
+        return list(chain.from_iterable(df['tokens']))
+    return token_stream(df['user_message']).tolist()
+
+
+FEATURES = {
+    "word_count": word_counts,
+    "link_count": link_counts,
+    "is_media": media_mask,
+    "is_question": question_mask,
+    "emojis": emoji_lists,
+    "tokens": token_lists,
+}
+
+
+def extract_features(df: pd.DataFrame, progress: Optional[ProgressCallback] = None) -> pd.DataFrame:
+    """
+    Run every per-message feature once, right after preprocess(),
+    and return the frame with them added as columns.
+    progress(stage, fraction), if given, is called before each feature and once at the end.
+    Raises ValueError for an empty frame (preprocess() found no messages).
+    """
+    if df.empty:
+        raise ValueError("no messages to extract features from")
+    df = df.copy()
+    stage = None
+    for i, (name, fn) in enumerate(FEATURES.items()):
+        stage = f"Extracting features: {name}"
+        if progress is not None:
+            progress(stage, i / len(FEATURES))
+        df[name] = fn(df['user_message']).to_numpy()
+    if progress is not None:
+        progress(stage, 1.0)
+    return df
+
+
+def feature(df: pd.DataFrame, name: str) -> pd.Series:
+    """The precomputed feature column if the frame has it, otherwise computed on the fly."""
+    if name in df.columns:
+        return df[name]
+    return FEATURES[name](df['user_message'])
@@ -1,121 +1,164 @@
 import pandas as pd
-import matplotlib.pyplot as plt
-import string
-from urlextract import URLExtract
 from wordcloud import WordCloud
 from collections import Counter
-import re
-import emoji
+from chat_index import OVERALL, ChatIndex, Rollup, activity_cube
+from preprocess import DAY_NAMES, MONTH_NAMES
+from features import emoji_counts, feature, link_counts, link_domains, tokens_of
+from timing import instrumented
 
-extractor = URLExtract()
-def fetch_stats(selected_user, df):
 
-    # Filter dataframe only if a specific user is selected
+def _select(df, selected_user):
+    """Rows for `selected_user`: an O(1) slice for a ChatIndex, a boolean filter for a plain frame."""
+    if isinstance(df, ChatIndex):
+        return df.view(selected_user)
     if selected_user != "over all":
         df = df[df['user'] == selected_user]
+    return df
 
 
-    # number of messages
-    num_msgs = df.shape[0]
+def _memoize(df, key, compute):
+    """Cache `compute(df)` alongside the chat when given a ChatIndex, otherwise just compute it."""
+    if isinstance(df, ChatIndex):
+        return df.memo(key, compute)
+    return compute(df)
 
-    # number of words (vectorized – faster)
-    num_words = df['user_message'].str.split().str.len().sum()
 
-    #num of meadia share
-    num_media = df[df['user_message'] == '<Media omitted>'].shape[0]
+def _frame(df):
+    """The full chat frame, whether given a DataFrame or a ChatIndex."""
+    return df.df if isinstance(df, ChatIndex) else df
 
-    #num of link share
-    all_url = []
-    for msg in df['user_message']:
-        urls = extractor.find_urls(msg)
-        all_url.extend(urls)
 
+def _rows_processed(args, kwargs, result):
+    """Rows a helper call worked on, for timing.METRICS: the selected user's (whole chat if none)."""
+    values = (*args, *kwargs.values())
+    df = next((v for v in values if isinstance(v, (pd.DataFrame, ChatIndex))), None)
+    if df is None:
+        return 0
+    selected_user = kwargs.get('selected_user', next((v for v in args if isinstance(v, str)), OVERALL))
+    if isinstance(df, ChatIndex):
+        return len(df.view(selected_user))
+    if selected_user == OVERALL:
+        return len(df)
+    return int((df['user'] == selected_user).sum())
 
-    return num_msgs, num_words ,num_media, len(all_url)
 
-## show top 5 member
-def show_top_user(df):
-    x = df['user'].value_counts().sort_values(ascending=False).head(5)
-    new_df = round((df['user'].value_counts()/df.shape[0])*100,2).reset_index().rename(columns={'user':'name','count':'percentage'})
+# every public helper records its calls in timing.METRICS (while enabled)
+_instrumented = instrumented(rows=_rows_processed)
 
 
-    fig, ax = plt.subplots()
+@_instrumented
+def fetch_stats(selected_user, df, strict_links=False):
+    chat = df
 
-    colors = ["red", "green", "blue", "orange", "purple"]
+    # Filter dataframe only if a specific user is selected
+    df = _select(df, selected_user)
 
-    ax.bar(x.index, x.values, color=colors[:len(x)])
-    ax.set_xticklabels(x.index, rotation=90)
-    ax.set_xlabel("user name")
-    ax.set_ylabel("number of messages")
 
-    return fig, x ,new_df  # return both plot and data
+    # number of messages
+    num_msgs = df.shape[0]
 
+    # number of words, media and links (precomputed per message)
+    num_words = int(feature(df, 'word_count').sum())
+    num_media = int(feature(df, 'is_media').sum())
+    if strict_links:
+        # opt-in: URLExtract over every message, run once per (chat, user) and kept with the chat
+        num_links = _memoize(chat, ('strict_links', selected_user), lambda chat: _strict_link_count(chat, selected_user))
+    else:
+        num_links = int(feature(df, 'link_count').sum())
+
+    return num_msgs, num_words ,num_media, num_links
+
+def _strict_link_count(df, selected_user):
+    return int(link_counts(_select(df, selected_user)['user_message'], strict=True).sum())
+
+## links shared per domain
+@_instrumented
+def link_domain_stats(selected_user, df, top=None):
+    domains = _memoize(df, ('link_domains', selected_user), lambda chat: _link_domains(chat, selected_user))
+    if top is not None:
+        domains = domains.head(top)
+
+    return domains.rename_axis('domain').reset_index(name='count')
+
+def _link_domains(df, selected_user):
+    df = _select(df, selected_user)
+    messages = df['user_message']
+    if 'link_count' in df.columns:
+        # every domain match is also a link match, so only messages with links need the scan
+        messages = messages[df['link_count'].to_numpy() > 0]
+    return link_domains(messages)
 
-## clean massege
+## show top 5 member
+@_instrumented
+def show_top_user(df):
+    # charts imports matplotlib/seaborn and sets the dashboard style; only chart callers pay for that
+    from charts import top_users_chart
 
+    x, new_df = top_users(df)
 
-def clean_messages(df, selected_user):
-    # Filter by selected user
-    if selected_user != "over all":
-        df = df[df['user'] == selected_user]
-
-    # Remove unwanted messages
-    temp = df[df['user_message'] != 'group_notification']
-    temp = temp[~temp['user_message'].isin([
-        '<Media omitted>', '<media omitted>', 'Media omitted', 'media omitted'
-    ])]
+    fig = top_users_chart(x)
 
-    # Load stopwords
-    with open('stop_words.txt', 'r', encoding='utf-8') as f:
-        stop_words = set(f.read().splitlines())
+    return fig, x ,new_df  # return both plot and data
 
-    # Punctuation remover
-    translator = str.maketrans('', '', string.punctuation)
+## top 5 members' message counts and everyone's share, without the chart
+@_instrumented
+def top_users(df):
+    df = _frame(df)
+    x = df['user'].value_counts().sort_values(ascending=False).head(5)
+    new_df = round((df['user'].value_counts()/df.shape[0])*100,2).reset_index().rename(columns={'user':'name','count':'percentage'})
 
-    # URL pattern
-    url_pattern = r'(https?://\S+|www\.\S+|https\S+)'
+    return x, new_df
 
-    cleaned_words = []
 
-    for msg in temp['user_message']:
-        # Remove URLs
-        msg = re.sub(url_pattern, "", msg)
+## clean massege
 
-        # Lowercase + remove punctuation
-        clean_msg = msg.lower().translate(translator)
 
-        # Remove stopwords
-        words = [w for w in clean_msg.split() if w not in stop_words]
+@_instrumented
+def clean_messages(df, selected_user):
+    # One token stream per (chat, user), shared by the word cloud and the top-20 table;
+    # media placeholders, URLs, punctuation and stopwords are already stripped
+    return _memoize(df, ('tokens', selected_user), lambda chat: tokens_of(_select(chat, selected_user)))
 
-        cleaned_words.extend(words)
 
-    return cleaned_words
+def _word_counts(df, selected_user):
+    return _memoize(df, ('word_counts', selected_user), lambda chat: Counter(clean_messages(chat, selected_user)))
 
 
 ## Word cloud
 
-def wc_stats(selected_user, df):
+# Words laid out in the cloud; the long tail of rare words costs layout time and isn't legible anyway
+WORDCLOUD_MAX_WORDS = 200
+
 
-    cleaned_words = clean_messages(df, selected_user)
+@_instrumented
+def wc_stats(selected_user, df, top=WORDCLOUD_MAX_WORDS):
+    # Built from the shared word counter (the one behind most_common_words) instead of
+    # re-tokenizing the joined text, and kept with the chat per (user, top)
+    return _memoize(df, ('wordcloud', selected_user, top), lambda chat: _wordcloud(chat, selected_user, top))
 
-    final_text = " ".join(cleaned_words)
+
+def _wordcloud(df, selected_user, top):
+    frequencies = dict(_word_counts(df, selected_user).most_common(top))
+    if not frequencies:
+        raise ValueError("We need at least 1 word to plot a word cloud, got 0.")
 
     wc = WordCloud(
         width=500,
         height=500,
         background_color="white",
-        min_font_size=10
-    ).generate(final_text)
+        min_font_size=10,
+        max_words=top,
+        random_state=0
+    ).generate_from_frequencies(frequencies)
 
     return wc
 
 ## most common word bar chart
+@_instrumented
 def most_common_words(df, selected_user):
 
-    cleaned_words = clean_messages(df, selected_user)
-
     result = pd.DataFrame(
-        Counter(cleaned_words).most_common(20),
+        _word_counts(df, selected_user).most_common(20),
         columns=['word', 'count']
     )
 
@@ -123,105 +166,95 @@ def most_common_words(df, selected_user):
 
 ## show emoji
 
+@_instrumented
 def emojies(selected_user,df):
-    if selected_user != "over all":
-        df = df[df['user'] == selected_user]
-    emojis = []
-
-    for msg in df['user_message']:
-        for ch in msg:
-            if ch in emoji.EMOJI_DATA:
-                emojis.append(ch)
-    if len(emojis) == 0:
+    counts = _memoize(df, ('emojis', selected_user), lambda chat: emoji_counts(_select(chat, selected_user)))
+    if not counts:
         return None, None
-    emo = pd.DataFrame(Counter(emojis).most_common(len(Counter(emojis))),columns=['emoji', 'count'])
-    new_df = pd.DataFrame(Counter(emojis).most_common(10),columns=['emoji', 'count'])
+    emo = pd.DataFrame(counts.most_common(), columns=['emoji', 'count'])
+    new_df = emo.head(10)
     return emo,new_df
 
 # timeline graph
-def monthly_timeline(df, selected_user):
-    if selected_user != "over all":
-        df = df[df['user'] == selected_user]
+def _timeline(df, selected_user, freq):
+    """Message counts per period for the selection, reduced from the chat's daily rollup."""
+    if isinstance(df, ChatIndex):
+        return df.rollup().series(selected_user, freq)
+    return Rollup.build(_select(df, selected_user)).series(OVERALL, freq)
 
-    timeline = df.groupby(['year', 'month', 'month_name']).count()['user_message']
-    timeline = timeline.to_frame(name="message").reset_index()
 
-    # your loop
-    time = []
-    for i in range(timeline.shape[0]):
-        time.append(f"{timeline['month_name'][i]}-{timeline['year'][i]}")
-    timeline['time'] = time
+@_instrumented
+def period_timeline(df, selected_user, freq='W'):
+    """Messages per day ('D'), week ('W'), month ('M') or year ('Y'); empty periods dropped."""
+    counts = _timeline(df, selected_user, freq)
+    counts = counts[counts > 0]
+    return pd.DataFrame({'date': counts.index, 'message': counts.to_numpy()})
 
-    # real date for sorting
-    timeline['date'] = pd.to_datetime(
-        timeline['year'].astype(str) + "-" + timeline['month'].astype(str) + "-01"
-    )
 
-    timeline = timeline.sort_values("date")
-    return timeline
+@_instrumented
+def monthly_timeline(df, selected_user):
+    timeline = period_timeline(df, selected_user, 'M')
+    months = pd.DatetimeIndex(timeline['date'])
+
+    timeline.insert(0, 'year', months.year)
+    timeline.insert(1, 'month', months.month)
+    timeline.insert(2, 'month_name', months.month_name())
+    timeline['time'] = timeline['month_name'] + "-" + timeline['year'].astype(str)
+
+    return timeline[['year', 'month', 'month_name', 'message', 'time', 'date']]
+@_instrumented
 def daily_timeline(df, selected_user):
-    if selected_user != "over all":
-        df = df[df['user'] == selected_user]
+    return period_timeline(df, selected_user, 'D')
+def _activity(df, selected_user):
+    """12 x 7 x 24 (month x weekday x hour) message counts for the selection."""
+    if isinstance(df, ChatIndex):
+        return df.activity(selected_user)
+    return activity_cube(_select(df, selected_user))
+
+
+def _ranked(counts, labels, name):
+    # same shape as value_counts(): busiest first, empty labels dropped
+    counts = pd.Series(counts, index=pd.Index(labels, name=name), name='count')
+    return counts[counts > 0].sort_values(ascending=False, kind='stable')
 
-    daily = df.groupby('date').count()['user_message'].reset_index()
-    daily = daily.rename(columns={"user_message": "message"})
-    return daily
+
+@_instrumented
 def week_activity_map(df, selected_user):
-    if selected_user != "over all":
-        df= df[df['user'] == selected_user]
-    return df['day_name'].value_counts()
+    return _ranked(_activity(df, selected_user).sum(axis=(0, 2)), DAY_NAMES, 'day_name')
 
+@_instrumented
 def month_activity_map(df, selected_user):
-    if selected_user != "over all":
-        df= df[df['user'] == selected_user]
-    return df['month_name'].value_counts()
+    return _ranked(_activity(df, selected_user).sum(axis=(1, 2)), MONTH_NAMES, 'month_name')
+
+# hour -> period label ("00-1", "1-2", ..., "23-00")
+PERIODS = ["00-1"] + [f"{hour}-{hour+1}" for hour in range(1, 23)] + ["23-00"]
 
+@_instrumented
 def show_heatmap(df, selected_user):
-    if selected_user != "over all":
-        df = df[df['user'] == selected_user]
-    df = df.copy()
-    periods = []
-    sort_keys = []
-    for hour in df['hour']:
-        if hour == 23:
-            periods.append(f"{hour}-00")
-            sort_keys.append(hour)      # 23
-        elif hour == 0:
-            periods.append(f"00-{hour+1}")
-            sort_keys.append(hour)      # 0
-        else:
-            periods.append(f"{hour}-{hour+1}")
-            sort_keys.append(hour)      # 1-22
-
-    df['period'] = periods
-    df['period_sort'] = sort_keys      # store sort index
-    return df
+    """Day x period message counts (rows/columns without any message dropped)."""
+    counts = _activity(df, selected_user).sum(axis=0)
+    pivot_df = pd.DataFrame(
+        counts,
+        index=pd.Index(DAY_NAMES, name='day_name'),
+        columns=pd.Index(PERIODS, name='period')
+    )
+    return pivot_df.loc[pivot_df.sum(axis=1) > 0, pivot_df.sum(axis=0) > 0]
 
 
 ## Question vs Statement Ratio Analysis
+@_instrumented
 def question_vs_statement(df, selected_user):
     """
     Analyze questions vs statements in messages
     Returns: question_count, statement_count, question_percentage
     """
-    if selected_user != "over all":
-        df = df[df['user'] == selected_user]
+    df = _select(df, selected_user)
 
-    # Remove media and group notifications
-    temp = df[df['user_message'] != 'group_notification']
-    temp = temp[~temp['user_message'].isin([
-        '<Media omitted>', '<media omitted>', 'Media omitted', 'media omitted'
-    ])]
+    # Remove media
+    text = ~feature(df, 'is_media')
 
-    questions = 0
-    statements = 0
-
-    for msg in temp['user_message']:
-        msg = str(msg).strip()
-        if msg.endswith('?'):
-            questions += 1
-        else:
-            statements += 1
+    questions = int((feature(df, 'is_question') & text).sum())
+    statements = int(text.sum()) - questions
 
     total = questions + statements
     question_percentage = round((questions / total * 100), 2) if total > 0 else 0
@@ -231,50 +264,36 @@ def question_vs_statement(df, selected_user):
 
 
 ## User-wise Question vs Statement Analysis (for comparison)
+@_instrumented
 def user_question_statement_analysis(df):
     """
     Analyze question vs statement ratio for all users
     Returns: DataFrame with user-wise breakdown
     """
+    return _memoize(df, ('question_table',), lambda chat: _question_table(_frame(chat)))
+
+
+def _question_table(df):
     # Remove unwanted users
     df = df[~df['user'].isin(['group_notification', 'Meta AI'])]
 
     # Remove media messages
-    df = df[~df['user_message'].isin([
-        '<Media omitted>', '<media omitted>', 'Media omitted', 'media omitted'
-    ])]
-
-    user_data = []
-
-    for user in df['user'].unique():
-        user_df = df[df['user'] == user]
-
-        questions = 0
-        statements = 0
-
-        for msg in user_df['user_message']:
-            msg = str(msg).strip()
-            if msg.endswith('?'):
-                questions += 1
-            else:
-                statements += 1
-
-        total = questions + statements
-        question_percentage = round((questions / total * 100), 2) if total > 0 else 0
-
-        user_data.append({
-            'user': user,
-            'questions': questions,
-            'statements': statements,
-            'total_messages': total,
-            'question_percentage': question_percentage
-        })
+    df = df[~feature(df, 'is_media')]
+
+    # one groupby over the precomputed is_question flag instead of a scan per user
+    result_df = (
+        feature(df, 'is_question')
+        .groupby(df['user'], observed=True, sort=False)
+        .agg(questions='sum', total_messages='size')
+        .rename_axis('user')
+        .reset_index()
+    )
+    result_df['user'] = result_df['user'].astype(object)
+    result_df['questions'] = result_df['questions'].astype('int64')
+    result_df['statements'] = result_df['total_messages'] - result_df['questions']
+    result_df['question_percentage'] = (result_df['questions'] / result_df['total_messages'] * 100).round(2)
 
-    result_df = pd.DataFrame(user_data)
+    result_df = result_df[['user', 'questions', 'statements', 'total_messages', 'question_percentage']]
     result_df = result_df.sort_values('question_percentage', ascending=False)
 
     return result_df
-
-
-
-
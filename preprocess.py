@@ -68,135 +68,445 @@
 #     return df
 
 
+import io
 import re
+from contextlib import contextmanager
 import pandas as pd
 import calendar
-from typing import Union
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Callable, Iterable, Iterator, List, Optional, TextIO, Tuple, Union
 from datetime import datetime
 
-def preprocess(data: Union[str, bytes]) -> pd.DataFrame:
+from cache import content_hash, frame_path, load_frame, save_frame
+from timing import ProgressCallback, instrumented
 
-    # --- READ DATA ---
+# Bump whenever the parsed frame changes (layout or rows kept), so on-disk caches are rebuilt
+PARSER_VERSION = 2
+
+# One header regex per line (supports 12-hour + AM/PM + 24-hour).
+# Anything that doesn't match it is a continuation of the previous message.
+pat_line = re.compile(
+    r'^(\d{1,2}[/\-\.]\d{1,2}[/\-\.]\d{2,4}),\s+(\d{1,2}:\d{2}(?:\s?[APMapm]{2})?) - (.*)$'
+)
+
+# "sender: message" inside the header remainder; otherwise it's a system line
+pat_sender = re.compile(r'^([^:]+): (.*)$', re.S)
+
+Source = Union[str, bytes, TextIO, BinaryIO]
+
+
+@contextmanager
+def _open_lines(data: Source) -> Iterator[Iterator[str]]:
+    """Yield a line iterator over raw text, bytes, a txt path or a file object."""
     if isinstance(data, bytes):
-        text = data.decode("utf-8", errors="ignore")
+        yield io.TextIOWrapper(io.BytesIO(data), encoding="utf-8", errors="ignore")
     elif isinstance(data, str):
         if data.lower().endswith(".txt") and "\n" not in data:
-            text = open(data, "r", encoding="utf-8", errors="ignore").read()
+            with open(data, "r", encoding="utf-8", errors="ignore") as f:
+                yield f
         else:
-            text = data
+            yield io.StringIO(data)
+    elif isinstance(data, io.TextIOBase):
+        yield data
+    elif hasattr(data, "read"):
+        # binary stream (open(..., "rb"), BytesIO, Streamlit UploadedFile);
+        # detach afterwards so the caller's stream isn't closed with the wrapper
+        wrapper = io.TextIOWrapper(data, encoding="utf-8", errors="ignore")
+        try:
+            yield wrapper
+        finally:
+            wrapper.detach()
     else:
-        raise TypeError("`data` must be raw text, bytes, or a txt file path")
-
-    # REGEX (supports 12-hour + AM/PM + 24-hour)
-    pat_chat = re.compile(
-        r'^(\d{1,2}[/\-\.]\d{1,2}[/\-\.]\d{2,4}),\s+(\d{1,2}:\d{2}(?:\s?[APMapm]{2})?) - ([^:]+): (.*)$',
-        re.M
-    )
-
-    pat_sys = re.compile(
-        r'^(\d{1,2}[/\-\.]\d{1,2}[/\-\.]\d{2,4}),\s+(\d{1,2}:\d{2}(?:\s?[APMapm]{2})?) - (.*)$',
-        re.M
-    )
-
-    rows = []
-
-    # CHAT MESSAGES
-    for date_str, time_str, sender, msg in pat_chat.findall(text):
-        rows.append({
-            "date_str": date_str.strip(),
-            "time_str": time_str.strip(),
-            "user": sender.strip(),
-            "user_message": msg.strip()
-        })
-
-    # SYSTEM MESSAGES
-    for date_str, time_str, msg in pat_sys.findall(text):
-        if ": " not in msg:
-            rows.append({
-                "date_str": date_str.strip(),
-                "time_str": time_str.strip(),
-                "user": "group_notification",
-                "user_message": msg.strip()
-            })
-
-    if not rows:
-        return pd.DataFrame()
+        raise TypeError("`data` must be raw text, bytes, a txt file path or a file object")
 
-    df = pd.DataFrame(rows)
 
-    # ============================================
-    #        DATE PARSER (MULTI-FORMAT)
-    # ============================================
-    def parse_date(d):
-        d = d.strip()
-
-        formats = [
-            "%d/%m/%Y", "%d/%m/%y",
-            "%m/%d/%Y", "%m/%d/%y",
-            "%d-%m-%Y", "%d-%m-%y",
-            "%m-%d-%Y", "%m-%d-%y",
-            "%d.%m.%Y", "%d.%m.%y"
-        ]
+# Lines read between two progress reports while scanning an export
+PROGRESS_LINES = 20000
+
+
+def _reporting(lines: Iterable[str], on_progress: Callable[[int], None]) -> Iterator[str]:
+    """
+    Pass `lines` through, calling on_progress(bytes read so far) every PROGRESS_LINES lines.
+    Lines are counted as UTF-8 so the total matches the export's size even for non-Latin chats.
+    """
+    consumed = 0
+    for i, line in enumerate(lines, 1):
+        consumed += len(line.encode("utf-8"))
+        if i % PROGRESS_LINES == 0:
+            on_progress(consumed)
+        yield line
+    on_progress(consumed)
+
+
+def iter_messages(data: Source, on_progress: Optional[Callable[[int], None]] = None
+                  ) -> Iterator[Tuple[str, str, str, str]]:
+    """
+    Single pass over the export, yielding (date_str, time_str, user, message)
+    as soon as each message is complete.
+    Continuation lines of multi-line messages are appended to the previous message,
+    lines before the first header are skipped.
+    on_progress, if given, is called now and then with the number of (UTF-8) bytes read.
+    """
+    current = None
+    lines = []
+
+    with _open_lines(data) as source:
+        if on_progress is not None:
+            source = _reporting(source, on_progress)
+        for line in source:
+            line = line.rstrip("\r\n")
+            m = pat_line.match(line)
+
+            if m is None:
+                if current is not None:
+                    lines.append(line)
+                continue
+
+            if current is not None:
+                yield current[0], current[1], current[2], "\n".join(lines).strip()
+
+            date_str, time_str, rest = m.groups()
+            s = pat_sender.match(rest)
+            if s is not None:
+                current = (date_str.strip(), time_str.strip(), s.group(1).strip())
+                lines = [s.group(2)]
+            else:
+                current = (date_str.strip(), time_str.strip(), "group_notification")
+                lines = [rest]
+
+    if current is not None:
+        yield current[0], current[1], current[2], "\n".join(lines).strip()
+
+
+MONTH_NAMES = list(calendar.month_name)[1:]
+DAY_NAMES = list(calendar.day_name)
 
-        for fmt in formats:
+# Rows used to detect the export's date/time layout
+SNIFF_SAMPLE = 2000
+
+pat_date_parts = re.compile(r'^(\d{1,2})([/\-\.])(\d{1,2})[/\-\.](\d{2,4})$')
+
+
+def sniff_formats(date_strs: pd.Series, time_strs: pd.Series, sample: int = SNIFF_SAMPLE) -> Tuple[str, str]:
+    """
+    Detect the strptime formats of an export from a sample of its header lines:
+    separator, dd/mm vs mm/dd, 2- vs 4-digit year and 12h vs 24h clock.
+    Returns (date_fmt, time_fmt).
+    """
+    parts = date_strs.iloc[:sample].str.extract(pat_date_parts).dropna()
+    if parts.empty:
+        return "%d/%m/%Y", "%H:%M"
+
+    sep = parts[1].mode().iloc[0]
+    year = "%Y" if parts[3].str.len().max() == 4 else "%y"
+
+    # dd/mm unless the sample (or, if still ambiguous, the whole column) says otherwise
+    day_first = True
+    for chunk in (parts, None):
+        if chunk is None:
+            if len(date_strs) <= sample:
+                break
+            chunk = date_strs.str.extract(pat_date_parts).dropna()
+        if (chunk[0].astype(int) > 12).any():
+            break
+        if (chunk[2].astype(int) > 12).any():
+            day_first = False
+            break
+
+    date_fmt = f"%d{sep}%m{sep}{year}" if day_first else f"%m{sep}%d{sep}{year}"
+
+    twelve_hour = time_strs.iloc[:sample].str.contains(r'[AaPp][Mm]', regex=True).any()
+    time_fmt = "%I:%M %p" if twelve_hour else "%H:%M"
+
+    return date_fmt, time_fmt
+
+
+# ============================================
+#     FALLBACK DATE PARSER (MULTI-FORMAT)
+# ============================================
+def parse_date(d):
+    d = d.strip()
+
+    formats = [
+        "%d/%m/%Y", "%d/%m/%y",
+        "%m/%d/%Y", "%m/%d/%y",
+        "%d-%m-%Y", "%d-%m-%y",
+        "%m-%d-%Y", "%m-%d-%y",
+        "%d.%m.%Y", "%d.%m.%y"
+    ]
+
+    for fmt in formats:
+        try:
+            return datetime.strptime(d, fmt)
+        except ValueError:
+            pass
+
+    return pd.NaT  # Avoid crash
+
+
+# ============================================
+#     FALLBACK TIME PARSER (12/24 AUTO-DETECT)
+# ============================================
+def parse_time(t):
+    t = t.strip().upper()
+
+    # 12-hour with AM/PM
+    if "AM" in t or "PM" in t:
+        fixes = [
+            "%I:%M %p",
+            "%I:%M%p",
+            "%I.%M %p"
+        ]
+        for fmt in fixes:
             try:
-                return datetime.strptime(d, fmt).date()
-            except:
+                return datetime.strptime(t, fmt)
+            except ValueError:
                 pass
 
-        return pd.NaT  # Avoid crash
+    # 24 hour formats
+    fixes_24 = ["%H:%M", "%H.%M"]
+
+    for fmt in fixes_24:
+        try:
+            return datetime.strptime(t, fmt)
+        except ValueError:
+            pass
+
+    return pd.NaT
+
+
+def _parse_column(values: pd.Series, fmt: str, fallback) -> pd.Series:
+    """One vectorized to_datetime call; only rows that fail it go through `fallback`."""
+    parsed = pd.to_datetime(values, format=fmt, errors="coerce")
+    bad = parsed.isna()
+    if bad.any():
+        parsed[bad] = pd.to_datetime(values[bad].map(fallback), errors="coerce")
+    return parsed
+
+
+def parse_dates(date_strs: pd.Series, date_fmt: str) -> pd.Series:
+    return _parse_column(date_strs, date_fmt, parse_date)
+
+
+def parse_times(time_strs: pd.Series, time_fmt: str) -> pd.Series:
+    if "%p" in time_fmt:
+        # "9:05pm", "9:05 PM", "9:05\u202fpm" -> "9:05 PM"
+        time_strs = time_strs.str.upper().str.replace(r'\s*([AP]M)$', r' \1', regex=True)
+    return _parse_column(time_strs, time_fmt, parse_time)
+
+
+def _read_bytes(data: Source) -> bytes:
+    if isinstance(data, bytes):
+        return data
+    if isinstance(data, str):
+        if data.lower().endswith(".txt") and "\n" not in data:
+            with open(data, "rb") as f:
+                return f.read()
+        return data.encode("utf-8")
+    if hasattr(data, "read"):
+        raw = data.read()
+        return raw.encode("utf-8") if isinstance(raw, str) else raw
+    raise TypeError("`data` must be raw text, bytes, a txt file path or a file object")
+
+
+def read_messages(data: Source, on_progress: Optional[Callable[[int], None]] = None) -> pd.DataFrame:
+    """Raw string columns (date_str, time_str, user, user_message) from one streaming pass."""
+    dates, times, users, messages = [], [], [], []
+    for date_str, time_str, user, msg in iter_messages(data, on_progress):
+        dates.append(date_str)
+        times.append(time_str)
+        users.append(user)
+        messages.append(msg)
+
+    return pd.DataFrame({
+        "date_str": dates,
+        "time_str": times,
+        "user": users,
+        "user_message": messages
+    })
+
+
+# ============================================
+#     PARALLEL CHUNKED PARSING (BIG EXPORTS)
+# ============================================
+# Below this size a process pool costs more than it saves
+MIN_PARALLEL_BYTES = 4 * 1024 * 1024
+
+# Chunks per worker, so uneven chunks still balance out
+CHUNKS_PER_WORKER = 4
+
+
+def split_chunks(raw: bytes, n: int) -> List[bytes]:
+    """
+    Cut `raw` into about `n` pieces, each cut placed right before a line that starts
+    a new message, so no multi-line message is split across chunks.
+    """
+    size = len(raw)
+    cuts = [0]
+    for i in range(1, n):
+        pos = max(size * i // n, cuts[-1])
+        while pos < size:
+            nl = raw.find(b"\n", pos)
+            if nl == -1:
+                pos = size
+                break
+            pos = nl + 1
+            end = raw.find(b"\n", pos)
+            line = raw[pos:size if end == -1 else end].decode("utf-8", errors="ignore")
+            if pat_line.match(line.rstrip("\r")):
+                break
+        if pos >= size:
+            break
+        cuts.append(pos)
+    cuts.append(size)
+    return [raw[a:b] for a, b in zip(cuts[:-1], cuts[1:])]
+
+
+def read_messages_parallel(raw: bytes, workers: int,
+                           on_progress: Optional[Callable[[int], None]] = None) -> pd.DataFrame:
+    """
+    read_messages() over message-aligned chunks in a process pool, concatenated in order.
+    on_progress, if given, gets the bytes covered by the chunks finished so far.
+    """
+    chunks = split_chunks(raw, workers * CHUNKS_PER_WORKER)
+    if len(chunks) == 1:
+        return read_messages(raw, on_progress)
+    parts, done = [], 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for chunk, part in zip(chunks, pool.map(read_messages, chunks)):
+            parts.append(part)
+            done += len(chunk)
+            if on_progress is not None:
+                on_progress(done)
+    return pd.concat(parts, ignore_index=True)
+
+
+def starts_message(raw: bytes, offset: int = 0) -> bool:
+    """
+    True if `raw[offset:]` begins on a message boundary, i.e. only blank lines come
+    before its first header line. False means `offset` falls inside a message.
+    """
+    pos, size = offset, len(raw)
+    while pos < size:
+        end = raw.find(b"\n", pos)
+        if end == -1:
+            end = size
+        line = raw[pos:end].decode("utf-8", errors="ignore").rstrip("\r")
+        if pat_line.match(line):
+            return True
+        if line.strip():
+            return False
+        pos = end + 1
+    return True
+
+
+# Share of preprocess() progress spent scanning the text; the rest is timestamps/calendar fields
+PARSE_SHARE = 0.85
+
+
+def _no_progress(stage: str, fraction: float) -> None:
+    pass
+
+
+@instrumented
+def preprocess(data: Source, compact: bool = False, cache_dir: Optional[str] = None,
+               workers: Optional[int] = None, formats: Optional[Tuple[str, str]] = None,
+               progress: Optional[ProgressCallback] = None) -> pd.DataFrame:
+    """
+    Parse a WhatsApp export into one row per message.
+    With compact=True `user` is categorical and `user_message` is string[pyarrow],
+    which keeps large group chats to a fraction of the object-dtype footprint.
+    With cache_dir set, the result is stored there keyed by content hash + parser version
+    and later calls memory-map it instead of parsing again.
+    With workers > 1, exports of MIN_PARALLEL_BYTES or more are split at message boundaries
+    and scanned in a process pool; the result is identical to the single-process parse.
+    The detected (date_fmt, time_fmt) are kept in df.attrs["formats"]; pass them back as
+    `formats` to parse an appended tail the same way instead of sniffing a small sample.
+    progress(stage, fraction), if given, is called as the parse moves through its stages
+    (see timing.StageTimer).
+    """
+    report = progress or _no_progress
+
+    # (a forced `formats` isn't part of the cache key, so such parses bypass the cache)
+    if cache_dir is not None and formats is None:
+        raw = _read_bytes(data)
+        key = f"{content_hash(raw)}-v{PARSER_VERSION}" + ("-compact" if compact else "")
+        path = frame_path(cache_dir, key)
+
+        report("Loading cached chat", 0.0)
+        df = load_frame(path)
+        if df is None:
+            df = preprocess(raw, compact=compact, workers=workers, progress=progress)
+            if not df.empty:
+                report("Saving cached chat", 1.0)
+                save_frame(df, path)
+        else:
+            report("Loading cached chat", 1.0)
+        return df
+
+    # --- READ DATA (one streaming pass, columnar buffers) ---
+    report("Parsing messages", 0.0)
+    parallel = workers is not None and workers > 1
+    if parallel or progress is not None:
+        # progress is reported against the export's size, so read it up front
+        raw = _read_bytes(data)
+        total = max(len(raw), 1)
+
+        def parse_progress(done):
+            report("Parsing messages", PARSE_SHARE * min(done / total, 1.0))
+        on_progress = parse_progress if progress is not None else None
+
+        if parallel and len(raw) >= MIN_PARALLEL_BYTES:
+            df = read_messages_parallel(raw, workers, on_progress)
+        else:
+            df = read_messages(raw, on_progress)
+        del raw
+    else:
+        df = read_messages(data)
+
+    if df.empty:
+        return pd.DataFrame()
 
     # ============================================
-    #        TIME PARSER (12/24 AUTO-DETECT)
+    #   DATE / TIME PARSER (SNIFF ONCE, VECTORIZED)
     # ============================================
-    def parse_time(t):
-        t = t.strip().upper()
-
-        # 12-hour with AM/PM
-        if "AM" in t or "PM" in t:
-            fixes = [
-                "%I:%M %p",
-                "%I:%M%p",
-                "%I.%M %p"
-            ]
-            for fmt in fixes:
-                try:
-                    return datetime.strptime(t, fmt).time()
-                except:
-                    pass
-
-        # 24 hour formats
-        fixes_24 = ["%H:%M", "%H.%M"]
-
-        for fmt in fixes_24:
-            try:
-                return datetime.strptime(t, fmt).time()
-            except:
-                pass
+    report("Parsing timestamps", PARSE_SHARE)
+    if formats is None:
+        formats = sniff_formats(df["date_str"], df["time_str"])
+    date_fmt, time_fmt = formats
+    date = parse_dates(df["date_str"], date_fmt)
+    time = parse_times(df["time_str"], time_fmt)
 
-        return pd.NaT
+    # one datetime64 column: a time that can't be parsed falls back to midnight, so the
+    # message is kept; header lines whose date can't be parsed at all are dropped
+    df["timestamp"] = date + (time - time.dt.normalize()).fillna(pd.Timedelta(0))
+    df = df[df["timestamp"].notna()].reset_index(drop=True)
 
-    # APPLY PARSERS
-    df["date"] = df["date_str"].apply(parse_date)
-    df["time"] = df["time_str"].apply(parse_time)
+    # CALENDAR FIELDS (.dt accessors, compact dtypes)
+    report("Building calendar fields", 0.95)
+    ts = df["timestamp"].dt
+    df["date"] = ts.normalize()
+    df["year"] = ts.year.astype("int16")
+    df["month"] = ts.month.astype("int8")
+    df["day"] = ts.day.astype("int8")
+    df["hour"] = ts.hour.astype("int8")
+    df["minute"] = ts.minute.astype("int8")
+    df["month_name"] = pd.Categorical.from_codes(ts.month.to_numpy() - 1, categories=MONTH_NAMES, ordered=True)
+    df["day_name"] = pd.Categorical.from_codes(ts.dayofweek.to_numpy(), categories=DAY_NAMES, ordered=True)
 
-    # EXTRA FIELDS
-    df["year"] = df["date"].apply(lambda x: x.year if pd.notnull(x) else None)
-    df["month"] = df["date"].apply(lambda x: x.month if pd.notnull(x) else None)
-    df["day"] = df["date"].apply(lambda x: x.day if pd.notnull(x) else None)
-    df["day_name"] = df["date"].apply(lambda x: x.strftime("%A") if pd.notnull(x) else "")
-    df["hour"] = df["time"].apply(lambda x: x.hour if pd.notnull(x) else None)
-    df["minute"] = df["time"].apply(lambda x: x.minute if pd.notnull(x) else None)
-    df["month_name"] = df["month"].apply(lambda x: calendar.month_name[x] if pd.notnull(x) else "")
-    df["only_date"] = df["date"]
+    if compact:
+        df["user"] = df["user"].astype("category")
+        df["user_message"] = df["user_message"].astype("string[pyarrow]")
 
     # FINAL ORDER
     df = df[
         [
-            "user_message", "date", "time", "user",
+            "user_message", "timestamp", "date", "user",
             "year", "month", "day", "hour", "minute",
-            "month_name", "only_date", "day_name"
+            "month_name", "day_name"
         ]
     ]
+    df.attrs["formats"] = (date_fmt, time_fmt)
+    report("Building calendar fields", 1.0)
 
     return df
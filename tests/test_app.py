@@ -0,0 +1,56 @@
+import os
+
+import pytest
+
+pytest.importorskip("streamlit")
+from streamlit.testing.v1 import AppTest
+
+from conftest import ROOT
+from preprocess import preprocess
+
+DEMO = os.path.join(ROOT, "WhatsApp Chat with BCA friend zone .txt")
+
+
+def _silent_user_day():
+    """A day with messages and a user who sent none of them."""
+    df = preprocess(DEMO)
+    df = df[~df["user"].isin(["group_notification", "Meta AI"])]
+    users = set(df["user"])
+    for day, rows in df.groupby(df["date"].dt.date):
+        silent = sorted(users - set(rows["user"]))
+        if silent:
+            return day, silent[0]
+    pytest.skip("every user talks on every day")
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.chdir(ROOT)
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=300)
+    at.run()
+    at.sidebar.radio(key="data_source").set_value("Use Demo Dataset").run()
+    at.sidebar.button(key="analyze_btn").click().run()
+    return at
+
+
+def test_sections_render_for_user_without_messages_in_range(app):
+    day, user = _silent_user_day()
+    app.sidebar.date_input[0].set_value((day, day)).run()
+    app.sidebar.selectbox(key="user_select").set_value(user).run()
+
+    for section in app.radio(key="section_select").options:
+        app.radio(key="section_select").set_value(section).run()
+        assert not app.exception, (section, [e.value for e in app.exception])
+
+    app.radio(key="section_select").set_value("⚡ Activity").run()
+    assert any(info.value == "No messages in this period." for info in app.info)
+
+
+def test_upload_without_messages_shows_error(monkeypatch):
+    monkeypatch.chdir(ROOT)
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=300)
+    at.run()
+    at.sidebar.file_uploader[0].set_value(("notes.txt", b"shopping list\nmilk\neggs\n", "text/plain")).run()
+
+    assert not at.exception, [e.value for e in at.exception]
+    assert any("no WhatsApp messages found" in error.value for error in at.sidebar.error)
@@ -0,0 +1,46 @@
+import pandas as pd
+import pytest
+
+from features import link_counts, link_domains
+
+MESSAGES = [
+    "naïve.io",
+    "Σgoogle.com",
+    "see google.com, ok",
+    "(github.com/x)",
+    "a.com b.com",
+    "a.com,b.com",
+    "mail me@gmail.com",
+    "google.community",
+    "google.comé",
+    "x https://a.b/c d",
+    "first line\nwww.site.in/page",
+    "no links here",
+]
+
+
+@pytest.mark.parametrize("dtype", [object, "string[pyarrow]"])
+def test_link_counts(dtype):
+    counts = link_counts(pd.Series(MESSAGES, dtype=dtype))
+    assert list(counts) == [0, 0, 1, 1, 2, 2, 0, 0, 1, 1, 1, 0]
+
+
+def test_link_counts_agree_across_dtypes():
+    messages = pd.Series(MESSAGES, dtype=object)
+    pd.testing.assert_series_equal(link_counts(messages), link_counts(messages.astype("string[pyarrow]")))
+
+
+def test_link_domains_only_where_links_are_counted():
+    messages = pd.Series(MESSAGES, dtype=object)
+    counts = link_counts(messages)
+    for i, message in enumerate(MESSAGES):
+        if counts[i] == 0:
+            assert link_domains(pd.Series([message])).empty, message
+
+
+def test_extract_features_rejects_empty_parse():
+    from features import extract_features
+    from preprocess import preprocess
+
+    with pytest.raises(ValueError):
+        extract_features(preprocess("not a chat export\n"))
@@ -0,0 +1,257 @@
+import atexit
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from typing import Callable, Dict, Optional
+
+import pandas as pd
+
+# progress(stage, fraction): `stage` is a short label, `fraction` how far the current call is (0..1)
+ProgressCallback = Callable[[str, float], None]
+
+
+def progress_range(progress: Optional[ProgressCallback], start: float, end: float) -> Optional[ProgressCallback]:
+    """
+    A progress callback for one step of a longer job: the step's own 0..1 fractions are
+    mapped onto [start, end] of `progress`, so a single bar moves forward across steps.
+    """
+    if progress is None:
+        return None
+
+    def report(stage: str, fraction: float = 0.0) -> None:
+        progress(stage, start + (end - start) * min(max(fraction, 0.0), 1.0))
+    return report
+
+
+class StageTimer:
+    """
+    Progress callback that records wall-clock time per stage.
+
+    Pass it as `progress=` to preprocess() / extract_features(), or call it directly
+    (timer("Indexing users")) around other work. A stage runs from its first report
+    until a different stage is reported or finish() is called; repeated stages add up.
+    Every report is also forwarded to `listener`, e.g. to drive a progress bar.
+    """
+
+    def __init__(self, listener: Optional[ProgressCallback] = None):
+        self.listener = listener
+        self.timings: Dict[str, float] = {}
+        self._stage = None
+        self._start = 0.0
+
+    def __call__(self, stage: str, fraction: float = 0.0) -> None:
+        now = time.perf_counter()
+        if stage != self._stage:
+            self._close(now)
+            self._stage, self._start = stage, now
+        if self.listener is not None:
+            self.listener(stage, min(max(fraction, 0.0), 1.0))
+
+    def finish(self) -> Dict[str, float]:
+        """End the running stage and return the timings (seconds per stage, in order)."""
+        self._close(time.perf_counter())
+        self._stage = None
+        return self.timings
+
+    def _close(self, now: float) -> None:
+        if self._stage is not None:
+            self.timings[self._stage] = self.timings.get(self._stage, 0.0) + now - self._start
+
+    @property
+    def total(self) -> float:
+        return sum(self.timings.values())
+
+
+# ============================================
+#   HOT-PATH METRICS (OPT-IN)
+# ============================================
+# WP_CHAT_METRICS=1 turns recording on at import; WP_CHAT_METRICS_MEMORY_EVERY=N samples
+# allocations on every Nth call of each function (0 = never); WP_CHAT_METRICS_LOG=path
+# writes the registry there as JSON when the process exits.
+METRICS_ENV = "WP_CHAT_METRICS"
+MEMORY_EVERY = 10
+
+
+class FunctionStats:
+    """Counters of one instrumented function."""
+    __slots__ = ("calls", "seconds", "max_seconds", "rows", "memory_samples", "alloc_bytes", "max_alloc_bytes")
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.rows = 0
+        self.memory_samples = 0
+        self.alloc_bytes = 0
+        self.max_alloc_bytes = 0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "calls": self.calls,
+            "seconds": round(self.seconds, 6),
+            "mean_seconds": round(self.seconds / self.calls, 6) if self.calls else 0.0,
+            "max_seconds": round(self.max_seconds, 6),
+            "rows": self.rows,
+            "memory_samples": self.memory_samples,
+            "mean_alloc_bytes": self.alloc_bytes // self.memory_samples if self.memory_samples else None,
+            "max_alloc_bytes": self.max_alloc_bytes if self.memory_samples else None,
+        }
+
+
+class Metrics:
+    """
+    In-process registry of per-function call counts, wall time, rows processed and
+    (sampled) allocated bytes, filled by @instrumented functions while enabled.
+
+    Allocation sampling runs tracemalloc around one call in `memory_every` (per function)
+    and records the call's traced peak, i.e. what Python and NumPy allocated while it
+    ran; Arrow buffers aren't traced. tracemalloc traces the whole process, so a sample
+    is only taken while no other instrumented call is running and is thrown away if one
+    starts before it ends (busy servers therefore get fewer samples). Allocations made
+    meanwhile by uninstrumented code on other threads, e.g. another Streamlit session
+    rendering a chart, are still counted. Nested instrumented calls are timed but not
+    sampled, and nothing is sampled while tracemalloc is already tracing for someone
+    else (e.g. benchmarks.run).
+    """
+
+    def __init__(self, enabled: bool = False, memory_every: int = MEMORY_EVERY):
+        self.enabled = enabled
+        self.memory_every = memory_every
+        self._stats: Dict[str, FunctionStats] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # outermost instrumented calls in flight (all threads), and the state of the running sample
+        self._active = 0
+        self._sampling = False
+        self._overlapped = False
+
+    def enable(self, memory_every: Optional[int] = None) -> None:
+        if memory_every is not None:
+            self.memory_every = memory_every
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    def record(self, name: str, seconds: float, rows: int = 0, alloc_bytes: Optional[int] = None) -> None:
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = FunctionStats()
+            stats.calls += 1
+            stats.seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+            stats.rows += rows
+            if alloc_bytes is not None:
+                stats.memory_samples += 1
+                stats.alloc_bytes += alloc_bytes
+                stats.max_alloc_bytes = max(stats.max_alloc_bytes, alloc_bytes)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Counters per function name, slowest (by total time) first."""
+        with self._lock:
+            items = [(name, stats.as_dict()) for name, stats in self._stats.items()]
+        return dict(sorted(items, key=lambda item: item[1]["seconds"], reverse=True))
+
+    def dump(self, path: str) -> None:
+        """Write the snapshot to `path` as JSON."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "functions": self.snapshot()}, f, indent=2)
+
+    def log(self, logger: Optional[logging.Logger] = None) -> None:
+        """One INFO line per function on `logger` (default: this module's)."""
+        logger = logger or logging.getLogger(__name__)
+        for name, stats in self.snapshot().items():
+            logger.info("%s: %d calls, %.4fs total, %.4fs max, %d rows, max alloc %s bytes", name,
+                        stats["calls"], stats["seconds"], stats["max_seconds"], stats["rows"], stats["max_alloc_bytes"])
+
+    def _call(self, name: str, rows: Callable, func: Callable, args: tuple, kwargs: dict):
+        stack = self._local.__dict__.setdefault("stack", [])
+        if name in stack:
+            # recursive call (e.g. preprocess parsing on a cache miss): counted once, by the outer call
+            return func(*args, **kwargs)
+
+        sample = False
+        if not stack:
+            with self._lock:
+                self._active += 1
+                if self._sampling:
+                    # this call's allocations would land in another thread's sample
+                    self._overlapped = True
+                elif self.memory_every and self._active == 1 and not tracemalloc.is_tracing():
+                    stats = self._stats.get(name)
+                    sample = (stats.calls if stats is not None else 0) % self.memory_every == 0
+                    self._sampling, self._overlapped = sample, False
+
+        stack.append(name)
+        alloc_bytes = peak = None
+        if sample:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            if sample:
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            stack.pop()
+            if not stack:
+                with self._lock:
+                    self._active -= 1
+                    if sample:
+                        self._sampling = False
+                        if not self._overlapped:
+                            alloc_bytes = peak
+
+        self.record(name, seconds, rows(args, kwargs, result), alloc_bytes)
+        return result
+
+
+METRICS = Metrics(
+    enabled=os.environ.get(METRICS_ENV, "") not in ("", "0"),
+    memory_every=int(os.environ.get(METRICS_ENV + "_MEMORY_EVERY", MEMORY_EVERY)),
+)
+
+if METRICS.enabled and os.environ.get(METRICS_ENV + "_LOG"):
+    atexit.register(METRICS.dump, os.environ[METRICS_ENV + "_LOG"])
+
+
+def frame_rows(args: tuple, kwargs: dict, result) -> int:
+    """
+    Rows of the first frame argument (a DataFrame, or a ChatIndex via its .df), else of the
+    result. Functions that work on a slice of their input pass their own `rows`.
+    """
+    for value in (*args, *kwargs.values(), result):
+        frame = getattr(value, "df", value)
+        if isinstance(frame, pd.DataFrame):
+            return len(frame)
+    return 0
+
+
+def instrumented(func: Optional[Callable] = None, *, name: Optional[str] = None,
+                 rows: Callable = frame_rows, registry: Metrics = METRICS):
+    """
+    Record calls of the decorated function in `registry` while it's enabled;
+    when it isn't, the wrapper only checks a flag. `rows(args, kwargs, result)`
+    says how many rows a call processed.
+    """
+    def decorate(func):
+        label = name or f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not registry.enabled:
+                return func(*args, **kwargs)
+            return registry._call(label, rows, func, args, kwargs)
+        return wrapper
+
+    return decorate(func) if func is not None else decorate